@@ -9,13 +9,18 @@ Description: An interactive Markdown editor pipe for OpenWebUI.
 import os
 import re
 import uuid
+import hashlib
+import asyncio
 import html
 import traceback
 import json
-from typing import Optional, List, Dict, Any, Callable, Awaitable
-import sys # Added for flushing print
+from collections import OrderedDict
+from typing import Optional, List, Dict, Set, Tuple, Any, Callable, Awaitable
+import logging
 
 from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
 # Assuming UPLOAD_DIR and File handling utilities are accessible
 # If not, these need to be defined or imported appropriately.
 # For standalone, we might need to mock or simplify these.
@@ -38,10 +43,27 @@ except ImportError:
             return file_form
 
 
-class MarkdownMiddlewareHTMLGenerator:
-    @staticmethod
-    def generate_style() -> str:
-        return """
+# orjson is much faster at escaping large documents; fall back to the stdlib if missing
+try:
+    import orjson
+
+    def dump_json(obj: Any, indent: bool = False) -> str:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+
+except ImportError:
+
+    def dump_json(obj: Any, indent: bool = False) -> str:
+        return json.dumps(obj, indent=2 if indent else None)
+
+
+# Matches ```markdown ... ``` or ```md ... ``` blocks
+MARKDOWN_BLOCK_PATTERN = re.compile(r"```(?:markdown|md)\s*([\s\S]*?)\s*```")
+
+
+# Static parts of the editor page, built once at import time. Only the
+# JSON-escaped markdown differs between messages.
+EDITOR_STYLE = """
         body {
             font-family: Arial, sans-serif;
             margin: 0;
@@ -152,18 +174,13 @@ class MarkdownMiddlewareHTMLGenerator:
         .view-toggle-buttons button { margin-left: 10px; }
         """
 
-    @staticmethod
-    def generate_script(initial_markdown: str) -> str:
-        # Escape the initial markdown for direct embedding in a JS string
-        escaped_initial_markdown = json.dumps(initial_markdown)
-
-        return f"""
+EDITOR_SCRIPT_PREFIX = """
         // Include Marked.js library from CDN
         const script = document.createElement('script');
         script.src = 'https://cdn.jsdelivr.net/npm/marked/marked.min.js';
         document.head.appendChild(script);
 
-        script.onload = () => {{
+        script.onload = () => {
             const editor = document.getElementById('markdown-editor');
             const preview = document.getElementById('markdown-preview');
             const documentId = 'current_markdown_document'; // For localStorage
@@ -182,15 +199,15 @@ class MarkdownMiddlewareHTMLGenerator:
             const toggleSplitButton = document.getElementById('toggle-split-btn');
 
 
-            function updatePreview() {{
+            function updatePreview() {
                 const markdownText = editor.value;
-                if (window.marked) {{
+                if (window.marked) {
                     preview.innerHTML = window.marked.parse(markdownText);
-                }}
+                }
                 localStorage.setItem(documentId, markdownText);
-            }}
+            }
 
-            function insertText(prefix, suffix = '') {{
+            function insertText(prefix, suffix = '') {
                 const start = editor.selectionStart;
                 const end = editor.selectionEnd;
                 const text = editor.value;
@@ -200,66 +217,66 @@ class MarkdownMiddlewareHTMLGenerator:
                 editor.value = text.substring(0, start) + newText + text.substring(end);
                 
                 editor.focus();
-                if (selectedText) {{
+                if (selectedText) {
                      editor.selectionStart = start + prefix.length;
                      editor.selectionEnd = start + prefix.length + selectedText.length;
-                }} else {{
+                } else {
                     editor.selectionStart = start + prefix.length;
                     editor.selectionEnd = start + prefix.length;
-                }}
+                }
                 updatePreview();
-            }}
+            }
 
             if (boldButton) boldButton.addEventListener('click', () => insertText('**', '**'));
             if (italicButton) italicButton.addEventListener('click', () => insertText('*', '*'));
             if (codeButton) codeButton.addEventListener('click', () => insertText('`', '`'));
-            if (linkButton) linkButton.addEventListener('click', () => {{
+            if (linkButton) linkButton.addEventListener('click', () => {
                 const url = prompt("Enter URL:", "http://");
-                if (url) {{
-                    insertText('[', `](${'{url}'})`);
-                }}
-            }});
+                if (url) {
+                    insertText('[', `](${url})`);
+                }
+            });
             if (listButton) listButton.addEventListener('click', () => insertText('- '));
 
-            if (toggleEditorButton) toggleEditorButton.addEventListener('click', () => {{
+            if (toggleEditorButton) toggleEditorButton.addEventListener('click', () => {
                 editorPane.classList.remove('hidden');
                 editorPane.style.flex = '1';
                 previewPane.classList.add('hidden');
                 previewPane.style.flex = '0';
-            }});
-            if (togglePreviewButton) togglePreviewButton.addEventListener('click', () => {{
+            });
+            if (togglePreviewButton) togglePreviewButton.addEventListener('click', () => {
                 previewPane.classList.remove('hidden');
                 previewPane.style.flex = '1';
                 editorPane.classList.add('hidden');
                 editorPane.style.flex = '0';
-            }});
-            if (toggleSplitButton) toggleSplitButton.addEventListener('click', () => {{
+            });
+            if (toggleSplitButton) toggleSplitButton.addEventListener('click', () => {
                 editorPane.classList.remove('hidden');
                 previewPane.classList.remove('hidden');
                 editorPane.style.flex = '1';
                 previewPane.style.flex = '1';
-            }});
+            });
             
             // Debounce updatePreview
             let debounceTimer;
-            editor.addEventListener('input', () => {{
+            editor.addEventListener('input', () => {
                 clearTimeout(debounceTimer);
                 debounceTimer = setTimeout(updatePreview, 250);
-            }});
+            });
 
             // Load saved content or initial content
             const savedMarkdown = localStorage.getItem(documentId);
-            editor.value = savedMarkdown !== null ? savedMarkdown : {escaped_initial_markdown};
+            editor.value = savedMarkdown !== null ? savedMarkdown : """
+
+EDITOR_SCRIPT_SUFFIX = """;
             
             // Initial preview
             // Wait a bit for marked to be surely loaded if script.onload is tricky
             setTimeout(updatePreview, 100); 
-        }};
+        };
         """
 
-    @classmethod
-    def create_middleware_html(cls, markdown_content: str) -> str:
-        return f"""
+EDITOR_HTML_PREFIX = """
         <!DOCTYPE html>
         <html lang="en">
         <head>
@@ -267,7 +284,7 @@ class MarkdownMiddlewareHTMLGenerator:
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
             <title>Interactive Markdown Editor</title>
             <style>
-                {cls.generate_style()}
+                """ + EDITOR_STYLE + """
             </style>
         </head>
         <body>
@@ -276,7 +293,7 @@ class MarkdownMiddlewareHTMLGenerator:
                 <div class="toolbar">
                     <button id="bold-btn" title="Bold">B</button>
                     <button id="italic-btn" title="Italic">I</button>
-                    <button id="code-btn" title="Code">{"{ }"}</button>
+                    <button id="code-btn" title="Code">{ }</button>
                     <button id="link-btn" title="Link">Link</button>
                     <button id="list-btn" title="List">- List</button>
                 </div>
@@ -295,16 +312,39 @@ class MarkdownMiddlewareHTMLGenerator:
                 </div>
             </div>
             <script>
-                {cls.generate_script(markdown_content)}
+                """ + EDITOR_SCRIPT_PREFIX
+
+EDITOR_HTML_SUFFIX = EDITOR_SCRIPT_SUFFIX + """
             </script>
         </body>
         </html>
         """
 
+
+class MarkdownMiddlewareHTMLGenerator:
+    @staticmethod
+    def generate_style() -> str:
+        return EDITOR_STYLE
+
+    @staticmethod
+    def generate_script(initial_markdown: str) -> str:
+        # Escape the initial markdown for direct embedding in a JS string
+        escaped_initial_markdown = dump_json(initial_markdown)
+        return EDITOR_SCRIPT_PREFIX + escaped_initial_markdown + EDITOR_SCRIPT_SUFFIX
+
+    @classmethod
+    def create_middleware_html(cls, markdown_content: str) -> str:
+        return EDITOR_HTML_PREFIX + dump_json(markdown_content) + EDITOR_HTML_SUFFIX
+
 class Pipe:
     class Valves(BaseModel):
         priority: int = Field(default=0, description="Priority for the filter.")
         enabled: bool = Field(default=True, description="Enable/disable the Markdown editor filter.")
+        max_chats: int = Field(default=256, description="Maximum number of chats whose documents are kept in memory.")
+        inline_threshold_chars: int = Field(
+            default=0,
+            description="Editors whose HTML is shorter than this are embedded inline as an iframe srcdoc instead of being saved as a file. 0 disables inlining.",
+        )
         # Could add more valves later, e.g., default markdown template, extract pattern
 
     class UserValves(BaseModel): # User-specific settings if needed later
@@ -319,25 +359,54 @@ class Pipe:
         
         # This would store markdown content per chat_id if we want persistence beyond one message
         # For V1, each message might just generate a new editor instance.
-        self.chat_documents: Dict[str, str] = {}
-
+        # Least recently updated chats are evicted once valves.max_chats is exceeded
+        self.chat_documents: "OrderedDict[str, str]" = OrderedDict()
+        # Directories already created by this instance, to skip repeated makedirs syscalls
+        self._created_dirs: Set[str] = set()
+        # (chat_id, sha256 of markdown) -> file DB id, so identical documents reuse one file
+        self.html_file_ids: Dict[Tuple[str, str], str] = {}
+
+
+    def remember_document(self, chat_id: str, markdown: str) -> None:
+        """Stores the latest document for a chat, evicting the least recently updated chats."""
+        self.chat_documents[chat_id] = markdown
+        self.chat_documents.move_to_end(chat_id)
+        while len(self.chat_documents) > self.valves.max_chats:
+            evicted_chat_id, _ = self.chat_documents.popitem(last=False)
+            for key in [k for k in self.html_file_ids if k[0] == evicted_chat_id]:
+                del self.html_file_ids[key]
+            self._created_dirs.discard(os.path.join(UPLOAD_DIR, self.viz_dir, evicted_chat_id, "html"))
 
     def ensure_chat_directory(self, chat_id: str) -> str:
         # Path will be uploads/markdown_editor/sessions/<chat_id>/html
         # The "html" part is where the middleware HTML files themselves will be stored.
         # The actual markdown content isn't directly saved as a separate .md file in this V1.
         chat_specific_html_dir = os.path.join(UPLOAD_DIR, self.viz_dir, chat_id, "html")
+        if chat_specific_html_dir in self._created_dirs:
+            return chat_specific_html_dir
         os.makedirs(chat_specific_html_dir, exist_ok=True)
+        self._created_dirs.add(chat_specific_html_dir)
         return chat_specific_html_dir
 
-    def write_content_to_file(self, content: str, user_id: str, chat_id: str) -> str:
-        """Writes the middleware HTML content to a file and returns its file ID."""
+    def _write_html_file(self, content: str, chat_id: str, filename: str) -> Tuple[str, int]:
+        """Blocking part of the write: creates the chat directory and writes the file.
+        Returns the file path and the number of bytes written."""
         chat_dir = self.ensure_chat_directory(chat_id) # This is now .../<chat_id>/html
-        filename = f"md_editor_{uuid.uuid4()}.html"
         file_path = os.path.join(chat_dir, filename)
 
-        with open(file_path, "w", encoding="utf-8") as f:
-            f.write(content)
+        # Encode once and reuse the bytes for the size instead of encoding again
+        data = content.encode("utf-8")
+        with open(file_path, "wb") as f:
+            f.write(data)
+        return file_path, len(data)
+
+    async def write_content_to_file(
+        self, content: str, user_id: str, chat_id: str, content_hash: Optional[str] = None
+    ) -> str:
+        """Writes the middleware HTML content to a file and returns its file ID."""
+        filename = f"md_editor_{content_hash or uuid.uuid4()}.html"
+        # Disk I/O runs in a worker thread so other chats keep streaming
+        file_path, size = await asyncio.to_thread(self._write_html_file, content, chat_id, filename)
 
         # Relative path for OpenWebUI to find the file from its UPLOAD_DIR perspective
         # Example: markdown_editor/sessions/<chat_id>/html/md_editor_uuid.html
@@ -349,12 +418,13 @@ class Pipe:
             meta={
                 "name": filename, # Display name
                 "content_type": "text/html",
-                "size": len(content.encode('utf-8')),
+                "size": size,
                 "path": file_path, # Absolute path on server
             },
         )
-        # This Files.insert_new_file is a mock if OpenWebUI components are not available
-        db_file_record = Files.insert_new_file(user_id, file_form)
+        # This Files.insert_new_file is a mock if OpenWebUI components are not available.
+        # The insert is a blocking DB call, so it also runs in a worker thread
+        db_file_record = await asyncio.to_thread(Files.insert_new_file, user_id, file_form)
         return db_file_record.id # Return the ID of the database record for the file
 
     def extract_markdown(self, content: str) -> Optional[str]:
@@ -363,16 +433,10 @@ class Pipe:
         For V1, let's assume the LLM might wrap it in ```markdown ... ```
         or we can have a setting to treat the whole message as markdown if no pattern found.
         """
-        # Regex to find ```markdown ... ``` or ```md ... ``` blocks
-        patterns = [
-            r"```markdown\s*([\s\S]*?)\s*```",
-            r"```md\s*([\s\S]*?)\s*```"
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, content, re.DOTALL)
-            if match:
-                return match.group(1).strip()
-        
+        match = MARKDOWN_BLOCK_PATTERN.search(content)
+        if match:
+            return match.group(1).strip()
+
         # If no specific block found, maybe treat the whole content if it looks like Markdown?
         # For now, let's be explicit. If no block, no Markdown.
         # A fallback could be: if "[[MARKDOWN_DOCUMENT]]" in content, take everything after.
@@ -394,47 +458,66 @@ class Pipe:
         __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
         __user__: Optional[Dict] = None,
     ) -> Dict:
-        print("MarkdownEditorFilter DEBUG: outlet method entered.", flush=True) # DEBUG Entry Point
+        logger.debug("MarkdownEditorFilter: outlet method entered.")
 
         if not self.valves.enabled:
-            print("MarkdownEditorFilter DEBUG: Pipe is not enabled, exiting outlet.", flush=True) # DEBUG
+            logger.debug("MarkdownEditorFilter: Pipe is not enabled, exiting outlet.")
             return body
 
         user_id = __user__.get("id") if __user__ else None
         chat_id = body.get("chat_id")
 
         if not (user_id and chat_id):
-            print("MarkdownEditorFilter DEBUG: User ID or Chat ID is missing.", flush=True) # DEBUG
+            logger.debug("MarkdownEditorFilter: User ID or Chat ID is missing.")
             return body
             
         if "messages" in body and body["messages"]:
             last_message_obj = body["messages"][-1]
             llm_content = last_message_obj.get("content", "")
-            print(f"MarkdownEditorFilter DEBUG: llm_content (first 200): {llm_content[:200]}", flush=True) # DEBUG
+            logger.debug("MarkdownEditorFilter: llm_content (first 200): %s", llm_content[:200])
 
             try:
                 extracted_markdown = self.extract_markdown(llm_content)
-                print(f"MarkdownEditorFilter DEBUG: Extracted Markdown: {extracted_markdown[:200] if extracted_markdown else 'None'}", flush=True) # DEBUG
+                logger.debug("MarkdownEditorFilter: Extracted Markdown: %s", extracted_markdown[:200] if extracted_markdown else None)
 
                 if extracted_markdown is not None:
-                    self.chat_documents[chat_id] = extracted_markdown 
-                    
-                    print(f"MarkdownEditorFilter: Extracted Markdown for chat {chat_id[:5]}...: {len(extracted_markdown)} chars", flush=True) # DEBUG
-
-                    middleware_html_content = MarkdownMiddlewareHTMLGenerator.create_middleware_html(
-                        markdown_content=extracted_markdown
-                    )
-                    print(f"MarkdownEditorFilter DEBUG: Generated HTML (first 500 chars): {middleware_html_content[:500]}", flush=True) # DEBUG
+                    self.remember_document(chat_id, extracted_markdown)
                     
-                    file_db_id = self.write_content_to_file(
-                        middleware_html_content,
-                        user_id,
-                        chat_id
-                    )
-                    print(f"MarkdownEditorFilter DEBUG: Obtained File DB ID: {file_db_id}", flush=True) # DEBUG
-
-                    last_message_obj["content"] += f"\\n\\n{{{{HTML_FILE_ID_{file_db_id}}}}}"
-                    print(f"MarkdownEditorFilter DEBUG: Final message content (last 200): {last_message_obj['content'][-200:]}", flush=True) # DEBUG
+                    logger.debug("MarkdownEditorFilter: Extracted Markdown for chat %s...: %d chars", chat_id[:5], len(extracted_markdown))
+
+                    content_hash = hashlib.sha256(extracted_markdown.encode("utf-8")).hexdigest()
+                    file_db_id = self.html_file_ids.get((chat_id, content_hash))
+                    editor_embed = None
+
+                    if file_db_id is None:
+                        # Escaping large documents is CPU-bound; keep it off the event loop
+                        middleware_html_content = await asyncio.to_thread(
+                            MarkdownMiddlewareHTMLGenerator.create_middleware_html,
+                            extracted_markdown,
+                        )
+                        logger.debug("MarkdownEditorFilter: Generated HTML (first 500 chars): %s", middleware_html_content[:500])
+
+                        if len(middleware_html_content) < self.valves.inline_threshold_chars:
+                            # Small documents skip the disk write and the Files DB insert entirely
+                            editor_embed = (
+                                f'<iframe srcdoc="{html.escape(middleware_html_content)}" '
+                                'style="width: 100%; height: 600px; border: none;"></iframe>'
+                            )
+                        else:
+                            file_db_id = await self.write_content_to_file(
+                                middleware_html_content,
+                                user_id,
+                                chat_id,
+                                content_hash
+                            )
+                            self.html_file_ids[(chat_id, content_hash)] = file_db_id
+
+                    if editor_embed is None:
+                        logger.debug("MarkdownEditorFilter: Obtained File DB ID: %s", file_db_id)
+                        editor_embed = f"{{{{HTML_FILE_ID_{file_db_id}}}}}"
+
+                    last_message_obj["content"] += f"\\n\\n{editor_embed}"
+                    logger.debug("MarkdownEditorFilter: Final message content (last 200): %s", last_message_obj["content"][-200:])
                     
                     if __event_emitter__ and __user__ and __user__.get("valves", {}).get("show_status_notifications", True):
                         await __event_emitter__({
@@ -442,12 +525,12 @@ class Pipe:
                             "data": {"description": "Markdown document editor ready.", "done": True},
                         })
                 else:
-                    print("MarkdownEditorFilter DEBUG: No markdown found in the message.", flush=True) # DEBUG
+                    logger.debug("MarkdownEditorFilter: No markdown found in the message.")
                     pass
 
             except Exception as e:
                 error_msg = f"Error processing Markdown content: {str(e)}\\n{traceback.format_exc()}"
-                print(f"MarkdownEditorFilter DEBUG: Exception in outlet: {error_msg}", flush=True) # DEBUG
+                logger.error("MarkdownEditorFilter: Exception in outlet: %s", error_msg)
                 last_message_obj["content"] += f"\\n\\nError creating Markdown editor: {html.escape(str(e))}"
                 if __event_emitter__ and __user__ and __user__.get("valves", {}).get("show_status_notifications", True):
                     await __event_emitter__({
@@ -455,9 +538,33 @@ class Pipe:
                         "data": {"description": f"Error creating editor: {html.escape(str(e))}", "done": True},
                     })
         else:
-            print("MarkdownEditorFilter DEBUG: No messages found in body or body is empty.", flush=True) # DEBUG
+            logger.debug("MarkdownEditorFilter: No messages found in body or body is empty.")
         return body
 
+    async def batch_outlet(
+        self,
+        bodies: List[Dict],
+        users: List[Optional[Dict]],
+        __event_emitter__: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> List[Dict]:
+        """
+        Runs outlet for several chats concurrently, so their disk writes and
+        DB inserts overlap instead of running one after another.
+        `bodies` and `users` must be the same length (one user per chat).
+        """
+        if len(bodies) != len(users):
+            raise ValueError(
+                f"batch_outlet got {len(bodies)} bodies but {len(users)} users"
+            )
+        return list(
+            await asyncio.gather(
+                *(
+                    self.outlet(body, __event_emitter__=__event_emitter__, __user__=user)
+                    for body, user in zip(bodies, users)
+                )
+            )
+        )
+
 # Example usage for standalone testing (won't fully work without OpenWebUI context)
 async def run_test():
     filter_instance = Pipe()
@@ -503,7 +610,7 @@ What do you think?
 
     updated_body = await filter_instance.outlet(test_body, __event_emitter__=mock_emitter, __user__=mock_user)
     
-    print(f"Updated body: {json.dumps(updated_body, indent=2)}")
+    print(f"Updated body: {dump_json(updated_body, indent=True)}")
     if "{{HTML_FILE_ID_" in updated_body["messages"][-1]["content"]:
         print("\\n--- Test successful: HTML_FILE_ID found ---")
         # You can find the generated HTML file in uploads/markdown_editor/sessions/chat_abc_789/html/
@@ -513,5 +620,4 @@ What do you think?
 if __name__ == "__main__":
     # This part is for basic testing of the class structure.
     # To fully test, it needs to be run within the OpenWebUI environment.
-    import asyncio
     asyncio.run(run_test()) 
\ No newline at end of file
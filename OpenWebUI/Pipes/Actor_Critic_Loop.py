@@ -13,16 +13,42 @@ license: MIT
 # Location: open-webui/backend/apps/pipes/
 
 import os
+import re
+import json
 import asyncio
-from typing import Optional, Callable, Awaitable
+import hashlib
+import random
+import logging
+import itertools
+import tempfile
+from collections import OrderedDict
+from typing import Optional, Callable, Awaitable, AsyncGenerator
 from pydantic import BaseModel, Field
 
+logger = logging.getLogger(__name__)
+
+try:
+    import orjson
+
+    def dump_json_bytes(obj, sort_keys: bool = False) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_SORT_KEYS if sort_keys else 0)
+
+    load_json = orjson.loads
+
+except ImportError:
+
+    def dump_json_bytes(obj, sort_keys: bool = False) -> bytes:
+        return json.dumps(obj, sort_keys=sort_keys).encode("utf-8")
+
+    load_json = json.loads
+
+
 # Import OpenWebUI's built-in functions
 try:
     from open_webui.main import generate_chat_completions
     from open_webui.models.users import User
 except ImportError as e:
-    print(f"Warning: Could not import OpenWebUI functions: {e}")
+    logger.warning("Could not import OpenWebUI functions: %s", e)
     # Fallback to langchain if OpenWebUI functions are not available
     try:
         from langchain_openai import ChatOpenAI
@@ -33,16 +59,190 @@ except ImportError as e:
         )
 
 
-# Helper function to send status updates to the OpenWebUI frontend
-async def send_status_message(
-    __event_emitter__: Optional[Callable[[dict], Awaitable[None]]],
-    status: str,
-    done: bool = False,
-):
-    if __event_emitter__:
-        await __event_emitter__(
-            {"type": "status", "data": {"description": status, "done": done}}
+# Error fragments that indicate the backend is rate limiting or overloaded
+OVERLOAD_ERROR_MARKERS = ("429", "503", "rate limit", "too many requests", "overloaded")
+OVERLOAD_STATUS_CODES = {429, 503}
+MAX_OVERLOAD_RETRIES = 3
+
+
+def is_overload_error(error: Exception) -> bool:
+    # HTTP errors (aiohttp, FastAPI/Starlette) carry the status code directly
+    status = getattr(error, "status", None) or getattr(error, "status_code", None)
+    if isinstance(status, int):
+        return status in OVERLOAD_STATUS_CODES
+    message = str(error).lower()
+    return any(marker in message for marker in OVERLOAD_ERROR_MARKERS)
+
+
+async def backoff_on_overload(error: Exception, attempt: int) -> bool:
+    """Sleeps with a small jittered delay if the error is a rate-limit/overload
+    error and retries remain. Returns True if the call should be retried."""
+    if attempt >= MAX_OVERLOAD_RETRIES or not is_overload_error(error):
+        return False
+    await asyncio.sleep(random.uniform(0, 0.25) * (2 ** attempt))
+    return True
+
+
+async def cancel_task(task: Optional[asyncio.Task]) -> None:
+    """Cancels a task and waits for it to unwind. Cancelling an in-flight completion
+    closes its HTTP connection, which makes Ollama and OpenAI-compatible servers
+    stop generating for it."""
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Expected from the cancelled task, but if the caller itself was cancelled
+        # while waiting here (the user stopped the chat), let that propagate
+        if asyncio.current_task().cancelling():
+            raise
+    except Exception:
+        pass
+
+
+def completion_cache_key(
+    model: str, messages: list, temperature: float, response_format: Optional[dict] = None
+) -> str:
+    payload = dump_json_bytes([model, temperature, messages, response_format], sort_keys=True)
+    return hashlib.sha256(payload).hexdigest()
+
+
+def read_cache_entry(cache_file: str) -> Optional[str]:
+    """Returns the completion stored in a disk cache file, or None if there is none."""
+    try:
+        with open(cache_file, "rb") as f:
+            return load_json(f.read())["content"]
+    except FileNotFoundError:
+        return None
+
+
+def write_cache_entry(cache_file: str, model: str, content: str) -> None:
+    """Writes a completion to a disk cache file. It is written to a temporary file
+    first and then renamed into place, so concurrent readers never see a partial entry."""
+    directory = os.path.dirname(cache_file)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(dump_json_bytes({"model": model, "content": content}))
+        os.replace(tmp_path, cache_file)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class LLMCache:
+    """A small in-memory LRU cache of completions for deterministic (low-temperature) calls."""
+
+    def __init__(self, maxsize: int = 512):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+# Limits evaluator calls in flight across all Pipe instances (and so across
+# concurrent chats), with the event loop and limit it was created for
+_evaluator_slots: Optional[asyncio.Semaphore] = None
+_evaluator_slots_key: Optional[tuple] = None
+
+
+def get_evaluator_slots(max_concurrency: int) -> asyncio.Semaphore:
+    """Returns the module-wide evaluator semaphore, recreated when the running event
+    loop or the configured limit changes."""
+    global _evaluator_slots, _evaluator_slots_key
+    key = (asyncio.get_running_loop(), max_concurrency)
+    if _evaluator_slots is None or _evaluator_slots_key != key:
+        _evaluator_slots = asyncio.Semaphore(max_concurrency)
+        _evaluator_slots_key = key
+    return _evaluator_slots
+
+
+# Worker prompt pieces. Only the feedback and query vary, and they are filled in
+# with format_map rather than rebuilding the whole prompt each attempt
+WORKER_SYSTEM_PROMPT = "You are a helpful assistant. Your goal is to provide a clear, accurate, and concise answer to the user's query."
+WORKER_FEEDBACK_TEMPLATE = "\n\nIMPORTANT: Your previous attempt was not satisfactory. You MUST revise it based on the following feedback:\n{feedback}"
+WORKER_QUERY_TEMPLATE = "\n\nUser's query: {query}"
+SPECULATIVE_REVISION_DIRECTIVE = "Revise your answer once more, fixing any remaining flaws."
+TRIVIAL_ANSWER_FEEDBACK = "Your previous answer was empty or only repeated the question. Provide a substantive response."
+
+# Evaluator directives constrain the verdict to a few tokens so decoding stays short
+EVALUATOR_DIRECTIVE = """Reply with exactly OK if the answer is high-quality, accurate, and directly addresses the user's question.
+Otherwise reply with FAIL: followed by a brief, constructive reason for the failure."""
+
+EVALUATOR_JSON_DIRECTIVE = """Reply only with JSON. Use {"ok": true} if the answer is high-quality, accurate, and directly addresses the user's question.
+Otherwise use {"ok": false, "reason": "<brief, constructive reason for the failure>"}."""
+
+# The rubric is sent as a byte-identical system message on every call, so the
+# backend can reuse its prompt (KV) cache; only the question and answer vary
+EVALUATOR_ROLE = "You are a strict but fair evaluator. Your task is to critique an answer based on a user's question."
+EVALUATOR_SYSTEM_PROMPT = f"{EVALUATOR_ROLE}\n{EVALUATOR_DIRECTIVE}"
+EVALUATOR_JSON_SYSTEM_PROMPT = f"{EVALUATOR_ROLE}\n{EVALUATOR_JSON_DIRECTIVE}"
+SAME_MODEL_EVALUATOR_TEMPLATE = "Now act as a strict but fair evaluator of your answer above.\n{directive}"
+EVALUATOR_QUESTION_TEMPLATE = 'Question: "{query}"\nAnswer: "'
+
+
+# Leading verdict label, also accepting the older SATISFACTORY wording and
+# markdown bold some models wrap it in. match() only scans the prefix.
+VERDICT_PATTERN = re.compile(
+    r"\s*\**\s*(OK|FAIL|NOT\s+SATISFACTORY|SATISFACTORY)\b\**\s*:?\s*", re.IGNORECASE
+)
+PASSING_VERDICTS = {"OK", "SATISFACTORY"}
+
+
+def extract_user_query(body: dict) -> str:
+    """Returns the text of the last message, which is either a plain string or
+    (e.g. with images) a list of content parts."""
+    messages = body.get("messages")
+    if not messages:
+        return ""
+    content = messages[-1].get("content")
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return next(
+            (item["text"] for item in content if isinstance(item, dict) and item.get("type") == "text"),
+            "",
         )
+    return ""
+
+
+def is_trivial_answer(answer: str, query: str) -> bool:
+    """True for answers that are obviously unusable (empty, or just the question
+    echoed back), so they can be sent back for revision without an evaluator call."""
+    text = answer.strip() if answer else ""
+    return not text or text.casefold() == query.strip().casefold()
+
+
+def parse_verdict(evaluation: str) -> tuple[bool, str]:
+    """Parses an evaluator reply into (passed, feedback)."""
+    text = evaluation.strip()
+    if text.startswith("{"):
+        try:
+            data = load_json(text)
+            return bool(data.get("ok")), str(data.get("reason") or text)
+        except (ValueError, AttributeError):
+            pass
+    match = VERDICT_PATTERN.match(text)
+    if match is None:
+        return False, text
+    if match.group(1).upper() in PASSING_VERDICTS:
+        return True, text
+    return False, text[match.end():].strip() or text
 
 
 class Pipe:
@@ -86,43 +286,270 @@ class Pipe:
             default="gpt-oss:latest",
             description="Model ID for the evaluator (Critic) that reviews answers.",
         )
+        WORKER_MODEL_POOL: str = Field(
+            default="",
+            description="Optional comma-separated worker model IDs (e.g. the same model behind different connections) used round-robin instead of WORKER_MODEL_ID.",
+        )
+        EVALUATOR_MODEL_POOL: str = Field(
+            default="",
+            description="Optional comma-separated evaluator model IDs used round-robin instead of EVALUATOR_MODEL_ID.",
+        )
         MAX_REVISIONS: int = Field(
             default=2,
             description="Maximum number of revision loops before giving up.",
         )
+        SPECULATIVE_REVISION: bool = Field(
+            default=False,
+            description="Draft the next revision while the evaluator is still grading the current answer. The draft is discarded if the answer passes.",
+        )
+        EARLY_ACCEPT_ON_NO_NEW_FEEDBACK: bool = Field(
+            default=False,
+            description="Accept the current answer instead of revising again when the evaluator repeats its previous feedback verbatim.",
+        )
+        EVALUATOR_JSON_MODE: bool = Field(
+            default=False,
+            description="Request a JSON verdict via response_format (for OpenAI-compatible endpoints that support it).",
+        )
+        EVALUATOR_SAMPLES: int = Field(
+            default=1,
+            description="Number of evaluator verdicts requested concurrently. With more than one, the answer passes on a majority of passing votes.",
+        )
+        EVALUATOR_SAMPLE_TEMPERATURE: float = Field(
+            default=0.7,
+            description="Evaluator temperature used when sampling more than one verdict.",
+        )
+        EVALUATOR_CONCURRENCY: int = Field(
+            default=0,
+            description="Maximum number of evaluator calls in flight at once, shared by all concurrent chats. 0 means no limit.",
+        )
+        MEMORY_CACHE_SIZE: int = Field(
+            default=512,
+            description="Number of deterministic completions (temperature <= MEMORY_CACHE_MAX_TEMPERATURE) kept in an in-memory LRU cache. 0 disables it.",
+        )
+        MEMORY_CACHE_MAX_TEMPERATURE: float = Field(
+            default=0.1,
+            description="Only completions requested at or below this temperature are kept in the in-memory cache.",
+        )
+        CACHE_ENABLED: bool = Field(
+            default=False,
+            description="Cache low-temperature completions (e.g. evaluator verdicts) on disk, keyed by model and prompt.",
+        )
+        CACHE_PATH: str = Field(
+            default="cache/actor_critic",
+            description="Directory used for the on-disk completion cache.",
+        )
+        CACHE_MAX_TEMPERATURE: float = Field(
+            default=0.2,
+            description="Only completions requested at or below this temperature are cached.",
+        )
 
     def __init__(self):
         self.type = "manifold"
-        self.valves = self.Valves(
-            **{k: os.getenv(k, v.default) for k, v in self.Valves.model_fields.items()}
-        )
+        # Environment overrides are read once at import (see ENV_VALVES below)
+        self.valves = ENV_VALVES.model_copy()
         # Store context from the request for helper methods
         self.__user__ = None
         self.__request__ = None
         self.__event_emitter__ = None
+        # Round-robin iterators over the model pools, shared across concurrent chats
+        self._model_cycles: dict[str, itertools.cycle] = {}
+        self._memory_cache = LLMCache(maxsize=self.valves.MEMORY_CACHE_SIZE)
+        # Validated User models keyed by user ID, with the dict they were built from
+        self._users: dict[str, tuple[dict, "User"]] = {}
 
     def pipes(self) -> list[dict[str, str]]:
         return [{"id": self.valves.AGENT_ID, "name": self.valves.AGENT_NAME}]
 
-    async def _generate_completion(self, model: str, messages: list, temperature: float = 0.7) -> str:
+    def _get_user(self, user: Optional[dict]):
+        """Returns the validated User for a request, reusing the previous model while
+        the user's dict is unchanged instead of re-validating it on every call."""
+        if not user:
+            return None
+        user_id = user.get("id")
+        cached = self._users.get(user_id)
+        if cached is not None and cached[0] == user:
+            return cached[1]
+        model = User(**user)
+        if user_id is not None:
+            self._users[user_id] = (dict(user), model)
+        return model
+
+    def _next_model(self, pool: str, default: str) -> str:
+        """Returns the next model ID from a comma-separated pool, or the default if the pool is empty."""
+        models = [m.strip() for m in pool.split(",") if m.strip()]
+        if not models:
+            return default
+        cycle = self._model_cycles.get(pool)
+        if cycle is None:
+            cycle = self._model_cycles[pool] = itertools.cycle(models)
+        return next(cycle)
+
+    def _cache_file(self, key: str, temperature: float) -> Optional[str]:
+        """Returns the cache file path for a request, or None if it should not be cached on disk."""
+        if not self.valves.CACHE_ENABLED or temperature > self.valves.CACHE_MAX_TEMPERATURE:
+            return None
+        return os.path.join(self.valves.CACHE_PATH, key[:2], f"{key}.json")
+
+    async def _generate_completion(
+        self,
+        model: str,
+        messages: list,
+        temperature: float = 0.7,
+        response_format: Optional[dict] = None,
+    ) -> str:
         """A helper function to call the LLM and get a response using OpenWebUI's API."""
-        try:
-            form_data = {
-                "model": model,
-                "messages": messages,
-                "stream": False,
-                "temperature": temperature,
-            }
-
-            response_data = await generate_chat_completions(
-                self.__request__,
-                form_data,
-                user=self.__user__,
+        use_memory_cache = (
+            self.valves.MEMORY_CACHE_SIZE > 0
+            and temperature <= self.valves.MEMORY_CACHE_MAX_TEMPERATURE
+        )
+        cache_key = None
+        cache_file = None
+        if use_memory_cache or self.valves.CACHE_ENABLED:
+            cache_key = completion_cache_key(model, messages, temperature, response_format)
+            cache_file = self._cache_file(cache_key, temperature)
+
+        if use_memory_cache:
+            self._memory_cache.maxsize = self.valves.MEMORY_CACHE_SIZE
+            content = self._memory_cache.get(cache_key)
+            if content is not None:
+                return content
+
+        if cache_file:
+            # Disk I/O runs in a worker thread so other chats are not held up
+            try:
+                content = await asyncio.to_thread(read_cache_entry, cache_file)
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Ignoring unreadable cache entry %s: %s", cache_file, e)
+                content = None
+            if content is not None:
+                if use_memory_cache:
+                    self._memory_cache.set(cache_key, content)
+                return content
+
+        form_data = {
+            "model": model,
+            "messages": messages,
+            "stream": False,
+            "temperature": temperature,
+        }
+        if response_format:
+            form_data["response_format"] = response_format
+
+        attempt = 0
+        while True:
+            try:
+                response_data = await generate_chat_completions(
+                    self.__request__,
+                    form_data,
+                    user=self.__user__,
+                )
+                content = response_data["choices"][0]["message"]["content"]
+                break
+            except Exception as e:
+                if await backoff_on_overload(e, attempt):
+                    attempt += 1
+                    continue
+                logger.error("Error in _generate_completion: %s", e)
+                raise
+
+        if cache_file:
+            try:
+                await asyncio.to_thread(write_cache_entry, cache_file, model, content)
+            except OSError as e:
+                logger.warning("Could not write cache entry %s: %s", cache_file, e)
+        if use_memory_cache:
+            self._memory_cache.set(cache_key, content)
+        return content
+
+    async def _evaluator_completion(self, **kwargs) -> str:
+        """Calls the evaluator model, waiting for a shared slot when EVALUATOR_CONCURRENCY is set."""
+        if self.valves.EVALUATOR_CONCURRENCY <= 0:
+            return await self._generate_completion(**kwargs)
+        async with get_evaluator_slots(self.valves.EVALUATOR_CONCURRENCY):
+            return await self._generate_completion(**kwargs)
+
+    async def _evaluate(self, messages: list) -> tuple[bool, str]:
+        """Runs the evaluator and returns whether the answer passed along with the verdict.
+        With EVALUATOR_SAMPLES > 1 the verdicts are requested concurrently and majority-voted."""
+        samples = max(1, self.valves.EVALUATOR_SAMPLES)
+        response_format = {"type": "json_object"} if self.valves.EVALUATOR_JSON_MODE else None
+        if samples == 1:
+            evaluation = await self._evaluator_completion(
+                model=self._next_model(self.valves.EVALUATOR_MODEL_POOL, self.valves.EVALUATOR_MODEL_ID),
+                messages=messages,
+                temperature=0.1,  # Use low temperature for more consistent evaluations
+                response_format=response_format,
             )
-            return response_data["choices"][0]["message"]["content"]
-        except Exception as e:
-            print(f"Error in _generate_completion: {str(e)}")
-            raise
+            return parse_verdict(evaluation)
+
+        evaluations = await asyncio.gather(
+            *(
+                self._evaluator_completion(
+                    model=self._next_model(self.valves.EVALUATOR_MODEL_POOL, self.valves.EVALUATOR_MODEL_ID),
+                    messages=messages,
+                    temperature=self.valves.EVALUATOR_SAMPLE_TEMPERATURE,
+                    response_format=response_format,
+                )
+                for _ in range(samples)
+            )
+        )
+        verdicts = [parse_verdict(e) for e in evaluations]
+        passed = [feedback for ok, feedback in verdicts if ok]
+        failed = [feedback for ok, feedback in verdicts if not ok]
+        if len(passed) * 2 > samples:
+            return True, passed[0]
+        return False, failed[0]
+
+    async def _stream_completion(
+        self, model: str, messages: list, temperature: float = 0.7
+    ) -> AsyncGenerator[str, None]:
+        """Streams the LLM response token chunks as they arrive using OpenWebUI's API."""
+        form_data = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "temperature": temperature,
+        }
+
+        response = await generate_chat_completions(
+            self.__request__,
+            form_data,
+            user=self.__user__,
+        )
+
+        # Some backends ignore the stream flag and return the full completion
+        if isinstance(response, dict):
+            yield response["choices"][0]["message"]["content"]
+            return
+
+        # Otherwise we get a StreamingResponse emitting OpenAI-style SSE lines
+        buffer = ""
+        body_iterator = response.body_iterator
+        try:
+            async for raw in body_iterator:
+                buffer += raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    line = line.strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    try:
+                        chunk = load_json(data)
+                    except ValueError:
+                        continue
+                    choices = chunk.get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            # Close the upstream stream right away if we stop early (or the client
+            # disconnects) so the backend stops generating tokens nobody will read
+            aclose = getattr(body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
 
     async def pipe(
         self,
@@ -141,21 +568,11 @@ class Pipe:
         """
         try:
             # Store context from the request for helper methods
-            self.__user__ = User(**__user__) if __user__ else None
+            self.__user__ = self._get_user(__user__)
             self.__request__ = __request__
             self.__event_emitter__ = __event_emitter__
 
-            user_query = ""
-            if body.get("messages") and "content" in body["messages"][-1]:
-                user_content = body["messages"][-1]["content"]
-                if isinstance(user_content, list):
-                    # Handle the case where content is a list (e.g., with images)
-                    for item in user_content:
-                        if isinstance(item, dict) and item.get("type") == "text":
-                            user_query = item["text"]
-                            break
-                else:
-                    user_query = user_content
+            user_query = extract_user_query(body)
 
             if not user_query:
                 yield "I didn't receive a question. Please ask something."
@@ -165,77 +582,149 @@ class Pipe:
 
             final_answer = f"Could not generate a satisfactory answer after {self.valves.MAX_REVISIONS} revisions."
             revision_feedback = ""
+            speculative_answer = None
+
+            # The query never changes between attempts, so the evaluator prompt
+            # around the answer is built once
+            if self.valves.EVALUATOR_JSON_MODE:
+                evaluator_directive, evaluator_system_prompt = EVALUATOR_JSON_DIRECTIVE, EVALUATOR_JSON_SYSTEM_PROMPT
+            else:
+                evaluator_directive, evaluator_system_prompt = EVALUATOR_DIRECTIVE, EVALUATOR_SYSTEM_PROMPT
+            same_model_directive = SAME_MODEL_EVALUATOR_TEMPLATE.format_map({"directive": evaluator_directive})
+            evaluator_prefix = EVALUATOR_QUESTION_TEMPLATE.format_map({"query": user_query})
+            evaluator_suffix = '"'
+            worker_query_suffix = WORKER_QUERY_TEMPLATE.format_map({"query": user_query})
 
             for i in range(self.valves.MAX_REVISIONS + 1):
                 attempt_num = i + 1
+                worker_model = self._next_model(self.valves.WORKER_MODEL_POOL, self.valves.WORKER_MODEL_ID)
                 await self._send_status(
                     f"Attempt {attempt_num}: Generating answer...",
                     False
                 )
 
                 # Prepare the prompt for the worker model
-                worker_prompt = """You are a helpful assistant. Your goal is to provide a clear, accurate, and concise answer to the user's query."""
-                
                 if revision_feedback:
-                    worker_prompt += f"\n\nIMPORTANT: Your previous attempt was not satisfactory. You MUST revise it based on the following feedback:\n{revision_feedback}"
-                
-                worker_prompt += f"\n\nUser's query: {user_query}"
-                
+                    worker_prompt = (
+                        WORKER_SYSTEM_PROMPT
+                        + WORKER_FEEDBACK_TEMPLATE.format_map({"feedback": revision_feedback})
+                        + worker_query_suffix
+                    )
+                else:
+                    worker_prompt = WORKER_SYSTEM_PROMPT + worker_query_suffix
+
                 worker_messages = [
                     {"role": "system", "content": worker_prompt},
                     {"role": "user", "content": user_query}
                 ]
 
-                # Generate the worker's response
-                current_answer = await self._generate_completion(
-                    model=self.valves.WORKER_MODEL_ID,
-                    messages=worker_messages,
-                    temperature=0.7
-                )
-
-                if i == self.valves.MAX_REVISIONS:
-                    final_answer = current_answer
+                # The final attempt is never evaluated, so stream it straight to the user
+                if i == self.valves.MAX_REVISIONS and speculative_answer is not None:
                     await self._send_status("Max revisions reached. Accepting final answer.", True)
-                    break
+                    yield speculative_answer
+                    return
+                if i == self.valves.MAX_REVISIONS:
+                    if i > 0:
+                        await self._send_status("Max revisions reached. Accepting final answer.", False)
+                    async for chunk in self._stream_completion(
+                        model=worker_model,
+                        messages=worker_messages,
+                        temperature=0.7
+                    ):
+                        yield chunk
+                    await self._send_status("Final answer delivered.", True)
+                    return
+
+                # Generate the worker's response, unless a speculative revision is ready
+                if speculative_answer is not None:
+                    current_answer = speculative_answer
+                    speculative_answer = None
+                else:
+                    current_answer = await self._generate_completion(
+                        model=worker_model,
+                        messages=worker_messages,
+                        temperature=0.7
+                    )
+
+                # Empty or echoed answers fail without spending an evaluator call
+                if is_trivial_answer(current_answer, user_query):
+                    await self._send_status(
+                        f"Attempt {attempt_num}: Answer was empty or trivial. Preparing for revision.",
+                        False
+                    )
+                    revision_feedback = TRIVIAL_ANSWER_FEEDBACK
+                    continue
 
                 # Have the evaluator review the response
                 await self._send_status(f"Attempt {attempt_num}: Evaluating answer...", False)
 
-                evaluator_prompt = f"""You are a strict but fair evaluator. Your task is to critique an answer based on a user's question.
-Your response MUST begin with one of two exact phrases:
-1. 'SATISFACTORY' if the answer is high-quality, accurate, and directly addresses the user's question.
-2. 'NOT SATISFACTORY:' if the answer has flaws. If so, you must provide a brief, constructive reason for the failure.
+                if not self.valves.EVALUATOR_MODEL_POOL and self.valves.EVALUATOR_MODEL_ID == worker_model:
+                    # Same model: continue the worker conversation so the backend can
+                    # reuse its prompt (KV) cache for the shared prefix
+                    evaluator_messages = worker_messages + [
+                        {"role": "assistant", "content": current_answer},
+                        {"role": "user", "content": same_model_directive},
+                    ]
+                else:
+                    evaluator_messages = [
+                        {"role": "system", "content": evaluator_system_prompt},
+                        {"role": "user", "content": evaluator_prefix + current_answer + evaluator_suffix},
+                    ]
 
-Original Question: "{user_query}"
-Answer to Evaluate: "{current_answer}"
+                eval_task = asyncio.create_task(self._evaluate(evaluator_messages))
 
-What is your evaluation?
-"""
-                evaluation = await self._generate_completion(
-                    model=self.valves.EVALUATOR_MODEL_ID,
-                    messages=[{"role": "user", "content": evaluator_prompt}],
-                    temperature=0.1  # Use low temperature for more consistent evaluations
-                )
+                # Pessimistically draft the next revision (using any previous feedback)
+                # while the evaluator is still grading this one
+                worker_task = None
+                if self.valves.SPECULATIVE_REVISION:
+                    worker_task = asyncio.create_task(
+                        self._generate_completion(
+                            model=worker_model,
+                            messages=worker_messages + [
+                                {"role": "assistant", "content": current_answer},
+                                {"role": "user", "content": SPECULATIVE_REVISION_DIRECTIVE},
+                            ],
+                            temperature=0.7
+                        )
+                    )
 
-                if evaluation.upper().startswith("SATISFACTORY"):
+                try:
+                    passed, evaluation = await eval_task
+                except Exception:
+                    await cancel_task(worker_task)
+                    raise
+
+                if passed:
+                    await cancel_task(worker_task)
                     await self._send_status(f"Attempt {attempt_num}: Evaluation PASSED!", True)
                     final_answer = current_answer
                     break
+                elif (
+                    self.valves.EARLY_ACCEPT_ON_NO_NEW_FEEDBACK
+                    and revision_feedback
+                    and evaluation.strip() == revision_feedback.strip()
+                ):
+                    # The revision did not address the feedback; another round is unlikely to help
+                    await cancel_task(worker_task)
+                    await self._send_status(
+                        f"Attempt {attempt_num}: No new feedback. Accepting answer.", True
+                    )
+                    final_answer = current_answer
+                    break
                 else:
                     await self._send_status(
                         f"Attempt {attempt_num}: Evaluation FAILED. Preparing for revision.",
                         False
                     )
                     revision_feedback = evaluation
-                    await asyncio.sleep(1)
+                    if worker_task:
+                        speculative_answer = await worker_task
 
             yield final_answer
 
         except Exception as e:
             error_msg = f"An error occurred in the critique-revise pipe: {str(e)}"
-            print(error_msg)
-            import traceback
-            traceback.print_exc()
+            logger.exception("Error in the critique-revise pipe")
             
             # More user-friendly error message
             if "Connection" in str(e) or "timeout" in str(e).lower():
@@ -252,8 +741,17 @@ What is your evaluation?
     
     async def _send_status(self, message: str, done: bool = False):
         """Helper method to send status updates."""
+        # A fresh dict per event: OpenWebUI may keep the data (e.g. in the
+        # message's status history), so a reused, mutated dict would rewrite it
         if self.__event_emitter__:
             await self.__event_emitter__({
                 "type": "status",
                 "data": {"description": message, "done": done}
             })
+
+
+# Valve defaults overridden by environment variables of the same name. Read and
+# validated once at import instead of on every Pipe construction.
+ENV_VALVES = Pipe.Valves(
+    **{k: os.getenv(k, v.default) for k, v in Pipe.Valves.model_fields.items()}
+)
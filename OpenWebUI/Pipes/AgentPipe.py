@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional, Callable, Awaitable
 from pydantic import BaseModel, Field
 import aiohttp
+import asyncio
 import json
 import logging
 
@@ -8,6 +9,15 @@ import logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def tool_result_message(result: Dict[str, Any]) -> Dict[str, Any]:
+    """Convert a tool result from execute_tool_calls into a "tool" role message."""
+    return {
+        "role": "tool",
+        "tool_call_id": result["tool_call_id"],
+        "content": str(result["result"] if "result" in result else result.get("error", ""))
+    }
+
 class Pipe:
     class Valves(BaseModel):
         ENABLED: bool = Field(
@@ -26,6 +36,10 @@ class Pipe:
             default="jan-nano:latest",
             description="The LLM model to use for generating responses"
         )
+        MAX_CONCURRENT_TOOLS: int = Field(
+            default=8,
+            description="Maximum number of tool calls executed concurrently"
+        )
         LLM_TEMPERATURE: float = Field(
             default=0.7,
             ge=0.0,
@@ -37,6 +51,50 @@ class Pipe:
             description="Maximum number of tokens to generate"
         )
 
+    # Available tools, shared by all instances since the schema never changes
+    # Note: These are just example tools. To add real functionality:
+    # 1. Define the tool specification in TOOLS
+    # 2. Implement the corresponding method (e.g., tool_echo)
+    # 3. Map the tool name to that method in TOOL_DISPATCH
+    TOOLS = [
+        {
+            "type": "function",
+            "function": {
+                "name": "echo",
+                "description": "Echo back the input text (for testing)",
+                "parameters": {
+                    "type": "object",
+                    "properties": {
+                        "text": {"type": "string", "description": "The text to echo back"}
+                    },
+                    "required": ["text"]
+                }
+            }
+        }
+        # To add more tools, uncomment and modify the example below:
+        # {
+        #     "type": "function",
+        #     "function": {
+        #         "name": "web_search",
+        #         "description": "Search the web for information",
+        #         "parameters": {
+        #             "type": "object",
+        #             "properties": {
+        #                 "query": {"type": "string", "description": "The search query"},
+        #                 "num_results": {"type": "integer", "description": "Number of results to return", "default": 3}
+        #             },
+        #             "required": ["query"]
+        #         }
+        #     }
+        # }
+    ]
+    TOOL_NAMES = frozenset(tool["function"]["name"] for tool in TOOLS)
+    # Tool name -> method implementing it
+    TOOL_DISPATCH = {
+        "echo": "tool_echo",
+        # "web_search": "tool_web_search",
+    }
+
     def __init__(self):
         self.type = "manifold"
         self.valves = self.Valves()
@@ -46,44 +104,8 @@ class Pipe:
         self.__event_call__ = None
         self.__task__ = None
         self.__model__ = None
-        
-        # Define available tools
-        # Note: These are just example tools. To add real functionality:
-        # 1. Define the tool specification here
-        # 2. Implement the corresponding method (e.g., tool_echo)
-        # 3. Add error handling in execute_tool_calls
-        self.tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "echo",
-                    "description": "Echo back the input text (for testing)",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "text": {"type": "string", "description": "The text to echo back"}
-                        },
-                        "required": ["text"]
-                    }
-                }
-            }
-            # To add more tools, uncomment and modify the example below:
-            # {
-            #     "type": "function",
-            #     "function": {
-            #         "name": "web_search",
-            #         "description": "Search the web for information",
-            #         "parameters": {
-            #             "type": "object",
-            #             "properties": {
-            #                 "query": {"type": "string", "description": "The search query"},
-            #                 "num_results": {"type": "integer", "description": "Number of results to return", "default": 3}
-            #             },
-            #             "required": ["query"]
-            #         }
-            #     }
-            # }
-        ]
+        # Shared HTTP session for tools, created lazily so keep-alive connections are reused
+        self._session: Optional[aiohttp.ClientSession] = None
 
     async def pipe(
         self,
@@ -164,22 +186,28 @@ class Pipe:
                 "tool_results": []
             }
 
+        # Build the LLM message list once and only append new tool results to it each
+        # iteration, instead of re-copying the whole conversation on every turn
+        messages = self.build_messages(
+            body["conversation"],
+            body["agent_state"]["tool_results"]
+        )
+
         # Main agent loop
         while (not body["agent_state"]["completed"] and 
                body["agent_state"]["iteration"] < self.valves.MAX_ITERATIONS):
             
             # Generate response (potentially with tool calls)
-            response = await self.generate_agent_response(
-                body["conversation"],
-                body["agent_state"]["tool_results"]
-            )
+            response = await self.generate_agent_response(messages)
             
-            # Process tool calls if any
-            if "tool_calls" in response:
+            # Process tool calls if any (the key is always present, so check it is non-empty;
+            # otherwise a final answer would trigger more LLM turns up to MAX_ITERATIONS)
+            if response.get("tool_calls"):
                 tool_results = await self.execute_tool_calls(
                     response["tool_calls"]
                 )
                 body["agent_state"]["tool_results"].extend(tool_results)
+                messages.extend(map(tool_result_message, tool_results))
             else:
                 body["agent_state"]["completed"] = True
                 body["response"] = response["content"]
@@ -188,20 +216,23 @@ class Pipe:
 
         return body
 
-    async def generate_agent_response(self, conversation, tool_results):
-        """Generate a response using the LLM, potentially with tool calls."""
+    @staticmethod
+    def build_messages(conversation, tool_results=None):
+        """Return a new LLM message list: the conversation followed by any tool results."""
+        messages = list(conversation)
+        if tool_results:
+            messages.extend(map(tool_result_message, tool_results))
+        return messages
+
+    async def generate_agent_response(self, messages, tool_results=None):
+        """Generate a response using the LLM, potentially with tool calls.
+
+        `messages` is sent as-is; pass `tool_results` only to get a one-off
+        list with those results appended.
+        """
         try:
-            # Prepare messages for the LLM
-            messages = conversation.copy()
-            
-            # Add tool results to the conversation if any
             if tool_results:
-                for result in tool_results:
-                    messages.append({
-                        "role": "tool",
-                        "tool_call_id": result["tool_call_id"],
-                        "content": str(result["result"])
-                    })
+                messages = self.build_messages(messages, tool_results)
 
             # Prepare the request to the LLM
             llm_request = {
@@ -209,7 +240,7 @@ class Pipe:
                 "model": self.valves.LLM_MODEL,
                 "temperature": self.valves.LLM_TEMPERATURE,
                 "max_tokens": self.valves.LLM_MAX_TOKENS,
-                "tools": self.tools,
+                "tools": self.TOOLS,
                 "tool_choice": "auto"
             }
             
@@ -235,34 +266,55 @@ class Pipe:
             }
 
     async def execute_tool_calls(self, tool_calls):
-        """Execute the requested tool calls."""
-        results = []
-        for tool_call in tool_calls:
+        """Execute the requested tool calls concurrently, preserving their order."""
+        semaphore = asyncio.Semaphore(max(1, self.valves.MAX_CONCURRENT_TOOLS))
+
+        async def run_tool_call(tool_call):
             tool_name = tool_call["name"]
             tool_args = tool_call["arguments"]
-            
-            try:
-                if tool_name == "echo":
-                    result = await self.tool_echo(**tool_args)
-                # Add more tools here as you implement them
-                # elif tool_name == "web_search":
-                #     result = await self.tool_web_search(**tool_args)
-                else:
-                    result = f"Unknown tool: {tool_name}"
-                
-                results.append({
-                    "tool_call_id": tool_call.get("id", ""),
-                    "tool_name": tool_name,
-                    "result": result
-                })
-            except Exception as e:
-                results.append({
-                    "tool_call_id": tool_call.get("id", ""),
-                    "tool_name": tool_name,
-                    "error": str(e)
-                })
-        
-        return results
+
+            async with semaphore:
+                try:
+                    handler = self.TOOL_DISPATCH.get(tool_name) if tool_name in self.TOOL_NAMES else None
+                    if handler is None:
+                        result = f"Unknown tool: {tool_name}"
+                    else:
+                        result = await getattr(self, handler)(**tool_args)
+
+                    return {
+                        "tool_call_id": tool_call.get("id", ""),
+                        "tool_name": tool_name,
+                        "result": result
+                    }
+                except Exception as e:
+                    return {
+                        "tool_call_id": tool_call.get("id", ""),
+                        "tool_name": tool_name,
+                        "error": str(e)
+                    }
+
+        # Tools are independent, so run them together; gather keeps the original order
+        return list(await asyncio.gather(*(run_tool_call(tc) for tc in tool_calls)))
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Return the shared HTTP session, creating it on first use or after it was closed."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=100,
+                    limit_per_host=32,
+                    ttl_dns_cache=300,
+                    keepalive_timeout=60,
+                ),
+                timeout=aiohttp.ClientTimeout(total=self.valves.TOOL_TIMEOUT),
+            )
+        return self._session
+
+    async def aclose(self):
+        """Close the shared HTTP session."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
 
     async def tool_echo(self, text: str) -> str:
         """Echo back the input text (for testing)."""
@@ -272,18 +324,20 @@ class Pipe:
     # async def tool_web_search(self, query: str, num_results: int = 3):
     #     """Search the web for information."""
     #     # Implementation using your preferred search API
-    #     # For example, using the requests library:
-    #     # response = requests.get(f"https://api.searchprovider.com/search?q={query}&limit={num_results}")
-    #     # return response.json()
-    #     pass
+    #     # For example, using the shared aiohttp session:
+    #     session = await self._get_session()
+    #     async with session.get(
+    #         "https://api.searchprovider.com/search",
+    #         params={"q": query, "limit": num_results},
+    #     ) as response:
+    #         return await response.json()
     # 
     # async def tool_scrape_website(self, url: str):
     #     """Scrape content from a website."""
-    #     # Implementation using requests/beautifulsoup
+    #     # Implementation using the shared aiohttp session and beautifulsoup
     #     # For example:
-    #     # import requests
-    #     # from bs4 import BeautifulSoup
-    #     # response = requests.get(url)
-    #     # soup = BeautifulSoup(response.text, 'html.parser')
-    #     # return soup.get_text()
-    #     pass
\ No newline at end of file
+    #     from bs4 import BeautifulSoup
+    #     session = await self._get_session()
+    #     async with session.get(url) as response:
+    #         soup = BeautifulSoup(await response.text(), 'html.parser')
+    #     return soup.get_text()
\ No newline at end of file
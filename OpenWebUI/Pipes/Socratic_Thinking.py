@@ -11,8 +11,11 @@ licence: MIT
 
 import os
 import re
+import json
 import asyncio
-from typing import Callable, Awaitable, Protocol
+import unittest
+from contextvars import ContextVar
+from typing import AsyncGenerator, Callable, Awaitable, Protocol
 
 from pydantic import BaseModel, Field
 
@@ -20,27 +23,25 @@ from open_webui.main import generate_chat_completions
 from open_webui.models.users import User
 
 # --- Constants for Prompts ---
+# The fixed instructions go in the system message and only the query, feedback
+# and answer go in the user message, so every call starts with the same prefix
+# that backends with prompt caching can reuse.
 
-GENERATOR_PROMPT_TEMPLATE = """
+GENERATOR_SYSTEM_PROMPT = """
 You are a helpful and brilliant expert assistant. Your goal is to provide the most accurate, comprehensive, and well-reasoned answer to the user's query.
 
 Analyze the user's query carefully and generate a clear and detailed response.
+"""
 
+GENERATOR_PROMPT_TEMPLATE = """
 **User Query:**
 {query}
 {feedback}
 """
 
-EVALUATOR_PROMPT_TEMPLATE = """
+EVALUATOR_SYSTEM_PROMPT = """
 You are a meticulous and impartial critic. Your role is to evaluate a generated answer based on its accuracy, completeness, relevance, and clarity in relation to the original user query. You must be strict and objective.
 
-**Original User Query:**
-{query}
-
-**Generated Answer to Evaluate:**
-{answer}
-
----
 **Evaluation Task:**
 
 1.  Compare the "Generated Answer" against the "Original User Query".
@@ -52,6 +53,207 @@ FAIL
 The answer incorrectly identifies the capital of Australia. It also fails to mention the primary export products, which was implicitly part of the "economic overview" requested by the user. The explanation of the political system is too simplistic.
 """
 
+EVALUATOR_PROMPT_TEMPLATE = """
+**Original User Query:**
+{query}
+
+**Generated Answer to Evaluate:**
+{answer}
+"""
+
+# When the evaluator is the generator model, it continues the generator conversation
+# with this directive instead, so the backend can reuse the cached query and answer
+SAME_MODEL_EVALUATOR_PROMPT = """
+Now act as a meticulous and impartial critic of your answer above. Evaluate it strictly and objectively for accuracy, completeness, relevance, and clarity in relation to the user query.
+
+1.  If the answer is fully satisfactory, accurate, and completely addresses the query without any errors or significant omissions, respond with ONLY the word: `PASS`.
+2.  If the answer is flawed in any way (e.g., inaccurate, incomplete, irrelevant, unclear, contains hallucinations), respond with the word `FAIL` on the first line, followed by a concise, constructive critique on the next lines. The critique should explain EXACTLY what is wrong and provide clear guidance on how to improve the answer.
+"""
+
+# Combined mode uses the generator's user message with these instructions
+COMBINED_SYSTEM_PROMPT = """
+You are a helpful and brilliant expert assistant. Your goal is to provide the most accurate, comprehensive, and well-reasoned answer to the user's query.
+
+Analyze the user's query carefully and generate a clear and detailed response. Then act as a meticulous and impartial critic of your own answer: check it strictly for accuracy, completeness, relevance, and clarity.
+
+**Response Format:**
+
+Write your answer inside <answer></answer> tags, followed by your verdict inside <verdict></verdict> tags.
+The verdict must be ONLY the word `PASS` if the answer fully and correctly addresses the query, or the word `FAIL` followed by a concise, constructive critique explaining EXACTLY what is wrong.
+
+<answer>
+...
+</answer>
+<verdict>
+...
+</verdict>
+"""
+
+
+def split_template(template: str, *fields: str) -> tuple[str, ...]:
+    """Splits a prompt template into the literal text around its `{field}`
+    placeholders (which must appear in the given order), so prompts can be
+    built by concatenation instead of re-parsing the template on every call."""
+    parts = []
+    rest = template
+    for field in fields:
+        head, rest = rest.split("{" + field + "}", 1)
+        parts.append(head)
+    parts.append(rest)
+    return tuple(parts)
+
+
+GENERATOR_PROMPT_PARTS = split_template(GENERATOR_PROMPT_TEMPLATE, "query", "feedback")
+EVALUATOR_PROMPT_PARTS = split_template(EVALUATOR_PROMPT_TEMPLATE, "query", "answer")
+
+COMBINED_RESPONSE_PATTERN = re.compile(
+    r"<answer>(.*?)</answer>\s*<verdict>(.*?)</verdict>", re.DOTALL | re.IGNORECASE
+)
+COMBINED_FORMAT_CRITIQUE = (
+    "FAIL\nThe response did not follow the required format. Put the answer inside "
+    "<answer></answer> tags and the verdict inside <verdict></verdict> tags."
+)
+
+# Matches a standalone PASS anywhere in an evaluation
+PASS_PATTERN = re.compile(r"\bPASS\b", re.IGNORECASE)
+
+
+# A statement that all of a critique's issues are small (see ACCEPT_MINOR_CRITIQUES):
+# "only minor issues", "the issues are minor", or a critique that opens with "Minor"
+MINOR_CRITIQUE_PATTERN = re.compile(
+    r"\b(?:only|just|merely)\s+(?:\w+\s+)?(?:minor|nitpicks?|nit-picky)\b"
+    r"|\b(?:issues?|problems?|flaws?|points?)\s+(?:are|is)\s+(?:all\s+)?(?:minor|nitpicks?|nit-picky)\b"
+    r"|^\W*(?:FAIL\W*)?(?:minor|nitpicks?)\b",
+    re.IGNORECASE | re.MULTILINE,
+)
+# Wording that rules that out: a negated "minor" or a substantive problem
+BLOCKING_CRITIQUE_PATTERN = re.compile(
+    r"(?:\bnot|n't)\s+(?:\w+\s+)?(?:minor|nitpick)"
+    r"|\b(?:incorrect|wrong|inaccurate|missing|major|significant|serious|critical|misleading)\b",
+    re.IGNORECASE,
+)
+
+
+def is_passing(evaluation: str) -> bool:
+    """Checks an evaluation for a PASS verdict. The evaluator is told to answer with
+    just `PASS`, so the start is checked first and the regex only scans the rest
+    (usually a long critique) when that fails."""
+    head = evaluation[:16].lstrip()[:5].upper()
+    if head[:4] == "PASS" and (len(head) == 4 or not (head[4].isalnum() or head[4] == "_")):
+        return True
+    return PASS_PATTERN.search(evaluation) is not None
+
+
+def is_minor_critique(critique: str) -> bool:
+    """Checks whether a critique calls all of its issues minor, without naming any
+    substantive problem."""
+    return (
+        MINOR_CRITIQUE_PATTERN.search(critique) is not None
+        and BLOCKING_CRITIQUE_PATTERN.search(critique) is None
+    )
+
+
+def parse_combined_response(response: str) -> tuple[str, str]:
+    """Splits a combined generate-and-evaluate response into (answer, evaluation)."""
+    match = COMBINED_RESPONSE_PATTERN.search(response)
+    if match is None:
+        return response.strip(), COMBINED_FORMAT_CRITIQUE
+    return match.group(1).strip(), match.group(2).strip()
+
+
+def pick_candidate(candidates: list[tuple[str, str]]) -> tuple[str, str]:
+    """Returns the first (answer, evaluation) pair that passed. If none did, returns
+    the first answer with every candidate's critique as its evaluation."""
+    for answer, evaluation in candidates:
+        if is_passing(evaluation):
+            return answer, evaluation
+    if len(candidates) == 1:
+        return candidates[0]
+    critiques = "\n\n".join(
+        f"Candidate {number}:\n{evaluation}"
+        for number, (_, evaluation) in enumerate(candidates, 1)
+    )
+    return candidates[0][0], critiques
+
+
+def loop_label(loop_count: int, candidate: int | None = None) -> str:
+    """Labels citations with the loop and, when several are generated, the candidate."""
+    if candidate is None:
+        return f"Loop {loop_count}"
+    return f"Loop {loop_count}, Candidate {candidate}"
+
+
+def prompt_messages(system_prompt: str, prompt: str) -> list[dict]:
+    """Builds the system + user message pair sent to a model."""
+    return [
+        {"role": "system", "content": system_prompt},
+        {"role": "user", "content": prompt},
+    ]
+
+
+async def cancel_task(task: asyncio.Task | None) -> None:
+    """Cancels a background task and waits for it to finish unwinding."""
+    if task is None or task.done():
+        return
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        # Expected from the cancelled task, but if the caller itself was cancelled
+        # while waiting here (the user stopped the chat), let that propagate
+        if asyncio.current_task().cancelling():
+            raise
+    except Exception:
+        pass
+
+
+class StatusQueue:
+    """
+    Sends one request's status updates in order, in the background, so the caller
+    is not held up by UI I/O. The emitter is the one the request was made with.
+    """
+
+    def __init__(self, event_emitter: Callable[[dict], Awaitable[None]] | None):
+        self.event_emitter = event_emitter
+        # Most recently queued update; each one waits for the one before it
+        self.last_task: asyncio.Task | None = None
+
+    def put(self, message: str, done: bool):
+        """Queues a status update."""
+        if self.event_emitter:
+            self.last_task = asyncio.create_task(
+                self._send(message, done, self.last_task)
+            )
+
+    async def _send(self, message: str, done: bool, previous: asyncio.Task | None):
+        """Sends a status update once the previously queued one has been sent."""
+        if previous is not None:
+            try:
+                await previous
+            except Exception:
+                pass
+        await self.event_emitter(
+            {
+                "type": "status",
+                "data": {"description": message, "done": done},
+            }
+        )
+
+    async def flush(self):
+        """Waits until every queued status update has been sent."""
+        while self.last_task is not None:
+            task = self.last_task
+            await task
+            if self.last_task is task:
+                self.last_task = None
+
+
+# The status queue of the request being handled. The Pipe instance is shared by
+# concurrent chats, so this cannot live on it; each request's task sets its own
+_status_queue: ContextVar[StatusQueue | None] = ContextVar(
+    "socratic_status_queue", default=None
+)
+
 
 class SendCitationType(Protocol):
     def __call__(self, url: str, title: str, content: str) -> Awaitable[None]: ...
@@ -107,6 +309,24 @@ class Pipe:
             le=2.0,
             description="The temperature for the generator model to control creativity.",
         )
+        SPECULATIVE_GENERATION: bool = Field(
+            default=False,
+            description="Draft the next attempt while the evaluator is still grading the current one. The draft does not see the latest critique and is discarded if the answer passes.",
+        )
+        COMBINED_MODE: bool = Field(
+            default=False,
+            description="Have the generator model write its answer and a PASS/FAIL verdict in one call, halving the calls per loop. EVALUATOR_MODEL is not used. Best with strong models; weaker ones tend to grade themselves leniently.",
+        )
+        ACCEPT_MINOR_CRITIQUES: bool = Field(
+            default=False,
+            description="From the second attempt on, accept a failed answer instead of refining it again when the critique calls all its issues minor (or nitpicks) and names no substantive problem. Saves a generator call, but it is only a wording heuristic.",
+        )
+        CANDIDATES_PER_LOOP: int = Field(
+            default=1,
+            ge=1,
+            le=5,
+            description="The number of answers generated and evaluated in parallel on each loop. The first one that passes is used; otherwise all critiques feed the next loop. Multiplies the model calls per loop, and SPECULATIVE_GENERATION only applies when this is 1.",
+        )
 
     def __init__(self):
         self.type = "manifold"
@@ -147,55 +367,194 @@ class Pipe:
         )
         return response_data["choices"][0]["message"]["content"]
 
-    async def _generate_answer(self, query: str, feedback: str, loop_count: int) -> str:
-        """Calls the generator model to produce an answer."""
-        await self.emit_status(
-            f"Thinking... (Attempt {loop_count}/{self.valves.MAX_LOOPS})", done=False
+    async def _stream_completion(
+        self, model: str, messages: list, temperature: float
+    ) -> AsyncGenerator[str, None]:
+        """Streams the LLM response token chunks as they arrive."""
+        form_data = {
+            "model": model,
+            "messages": messages,
+            "stream": True,
+            "temperature": temperature,
+        }
+
+        response = await generate_chat_completions(
+            self.__request__,
+            form_data,
+            user=self.__user__,
         )
 
+        # Some backends ignore the stream flag and return the full completion
+        if isinstance(response, dict):
+            yield response["choices"][0]["message"]["content"]
+            return
+
+        # Otherwise we get a StreamingResponse emitting OpenAI-style SSE lines
+        buffer = ""
+        body_iterator = response.body_iterator
+        try:
+            async for raw in body_iterator:
+                buffer += raw.decode("utf-8") if isinstance(raw, bytes) else raw
+                *lines, buffer = buffer.split("\n")
+                for line in lines:
+                    line = line.strip()
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[len("data:"):].strip()
+                    if data == "[DONE]":
+                        return
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    choices = chunk.get("choices") or [{}]
+                    content = choices[0].get("delta", {}).get("content")
+                    if content:
+                        yield content
+        finally:
+            # Stop the backend generating tokens nobody will read if we exit early
+            aclose = getattr(body_iterator, "aclose", None)
+            if aclose is not None:
+                await aclose()
+
+    def _generator_prompt(self, query: str, feedback: str) -> str:
+        """Builds the generator's user message for a query and the critiques so far."""
         feedback_section = ""
         if feedback:
             feedback_section = f"\n**Feedback on Previous Attempt:**\n{feedback}"
 
-        prompt = GENERATOR_PROMPT_TEMPLATE.format(
-            query=query, feedback=feedback_section
+        parts = GENERATOR_PROMPT_PARTS
+        return parts[0] + query + parts[1] + feedback_section + parts[2]
+
+    def _draft_answer(self, query: str, feedback: str) -> asyncio.Task:
+        """Starts generating an answer in the background, without any UI updates."""
+        messages = prompt_messages(
+            GENERATOR_SYSTEM_PROMPT, self._generator_prompt(query, feedback)
+        )
+        return asyncio.create_task(
+            self._generate_completion(
+                self.valves.GENERATOR_MODEL, messages, self.valves.TEMPERATURE
+            )
         )
-        messages = [{"role": "user", "content": prompt}]
+
+    async def _generate_answer(
+        self,
+        query: str,
+        feedback: str,
+        loop_count: int,
+        draft: asyncio.Task | None = None,
+        candidate: int | None = None,
+        stream: bool = False,
+    ) -> str:
+        """Calls the generator model to produce an answer, or uses a speculative
+        draft already started with the same query and feedback. With `stream`,
+        the answer is also sent to the chat as it is generated."""
+        await self.emit_status(
+            f"Thinking... (Attempt {loop_count}/{self.valves.MAX_LOOPS})", done=False
+        )
+
+        prompt = self._generator_prompt(query, feedback)
+        messages = prompt_messages(GENERATOR_SYSTEM_PROMPT, prompt)
 
         # Send generator prompt to citations
         if self.send_citation:
             await self.send_citation(
                 url=f"socratic-thinking-loop-{loop_count}",
-                title=f"Generator Prompt (Loop {loop_count})",
-                content=prompt
+                title=f"Generator Prompt ({loop_label(loop_count, candidate)})",
+                content=GENERATOR_SYSTEM_PROMPT + prompt
             )
 
-        answer = await self._generate_completion(
-            self.valves.GENERATOR_MODEL, messages, self.valves.TEMPERATURE
-        )
+        if draft is not None:
+            answer = await draft
+        elif stream:
+            chunks = []
+            async for chunk in self._stream_completion(
+                self.valves.GENERATOR_MODEL, messages, self.valves.TEMPERATURE
+            ):
+                chunks.append(chunk)
+                await self.emit_message(chunk)
+            answer = "".join(chunks)
+        else:
+            answer = await self._generate_completion(
+                self.valves.GENERATOR_MODEL, messages, self.valves.TEMPERATURE
+            )
 
         # Send generator response to citations
         if self.send_citation:
             await self.send_citation(
                 url=f"socratic-thinking-loop-{loop_count}",
-                title=f"Generator Response (Loop {loop_count})",
+                title=f"Generator Response ({loop_label(loop_count, candidate)})",
                 content=answer
             )
         return answer
 
-    async def _evaluate_answer(self, query: str, answer: str, loop_count: int = 1) -> str:
-        """Calls the evaluator model to critique an answer."""
+    async def _generate_and_evaluate(
+        self, query: str, feedback: str, loop_count: int, candidate: int | None = None
+    ) -> tuple[str, str]:
+        """Calls the generator model once to produce both an answer and its verdict."""
+        await self.emit_status(
+            f"Thinking... (Attempt {loop_count}/{self.valves.MAX_LOOPS})", done=False
+        )
+
+        prompt = self._generator_prompt(query, feedback)
+        messages = prompt_messages(COMBINED_SYSTEM_PROMPT, prompt)
+
+        # Send combined prompt to citations
+        if self.send_citation:
+            await self.send_citation(
+                url=f"socratic-thinking-loop-{loop_count}",
+                title=f"Combined Prompt ({loop_label(loop_count, candidate)})",
+                content=COMBINED_SYSTEM_PROMPT + prompt
+            )
+
+        response = await self._generate_completion(
+            self.valves.GENERATOR_MODEL, messages, self.valves.TEMPERATURE
+        )
+
+        # Send combined response to citations
+        if self.send_citation:
+            await self.send_citation(
+                url=f"socratic-thinking-loop-{loop_count}",
+                title=f"Combined Response ({loop_label(loop_count, candidate)})",
+                content=response
+            )
+
+        return parse_combined_response(response)
+
+    async def _evaluate_answer(
+        self,
+        query: str,
+        answer: str,
+        loop_count: int = 1,
+        candidate: int | None = None,
+        feedback: str | None = None,
+    ) -> str:
+        """Calls the evaluator model to critique an answer. `feedback` is what the
+        answer was generated with; when given and the evaluator is the generator
+        model, the critique continues that generator conversation."""
         await self.emit_status("Evaluating answer...", done=False)
 
-        prompt = EVALUATOR_PROMPT_TEMPLATE.format(query=query, answer=answer)
-        messages = [{"role": "user", "content": prompt}]
-        
+        if feedback is not None and self.valves.EVALUATOR_MODEL == self.valves.GENERATOR_MODEL:
+            # Same prefix as the generator call, so its prompt (KV) cache is reused
+            messages = prompt_messages(
+                GENERATOR_SYSTEM_PROMPT, self._generator_prompt(query, feedback)
+            ) + [
+                {"role": "assistant", "content": answer},
+                {"role": "user", "content": SAME_MODEL_EVALUATOR_PROMPT},
+            ]
+            citation = SAME_MODEL_EVALUATOR_PROMPT
+        else:
+            parts = EVALUATOR_PROMPT_PARTS
+            prompt = parts[0] + query + parts[1] + answer + parts[2]
+            messages = prompt_messages(EVALUATOR_SYSTEM_PROMPT, prompt)
+            citation = EVALUATOR_SYSTEM_PROMPT + prompt
+
         # Send evaluator prompt to citations
         if self.send_citation:
             await self.send_citation(
                 url=f"socratic-thinking-loop-{loop_count}",
-                title=f"Evaluator Prompt (Loop {loop_count})",
-                content=prompt
+                title=f"Evaluator Prompt ({loop_label(loop_count, candidate)})",
+                content=citation
             )
 
         # Use a low temperature for the evaluator to get consistent, objective feedback
@@ -207,26 +566,26 @@ class Pipe:
         if self.send_citation:
             await self.send_citation(
                 url=f"socratic-thinking-loop-{loop_count}",
-                title=f"Evaluator Response (Loop {loop_count})",
+                title=f"Evaluator Response ({loop_label(loop_count, candidate)})",
                 content=evaluation
             )
             
         return evaluation.strip()
 
     async def emit_status(self, message: str, done: bool):
-        """Emits a status update to the user interface."""
-        if self.__event_emitter__:
-            await self.__event_emitter__(
-                {
-                    "type": "status",
-                    "data": {"description": message, "done": done},
-                }
-            )
+        """Queues a status update for the user interface without waiting for it to
+        be sent, so the next model call is not held up by UI I/O. Updates are still
+        sent in order, and before any later chat message."""
+        queue = _status_queue.get()
+        if queue is not None:
+            queue.put(message, done)
 
     async def emit_message(self, message: str):
         """Emits a chat message to the user interface."""
-        if self.__event_emitter__:
-            await self.__event_emitter__(
+        queue = _status_queue.get()
+        if queue is not None and queue.event_emitter:
+            await queue.flush()
+            await queue.event_emitter(
                 {
                     "type": "message",
                     "data": {"content": message},
@@ -266,27 +625,111 @@ class Pipe:
         if not user_query:
             return ""
 
+        # Status updates and messages of this request go through its own queue
+        queue = StatusQueue(__event_emitter__)
+        token = _status_queue.set(queue)
+        try:
+            return await self._refine(user_query)
+        finally:
+            try:
+                await queue.flush()
+            finally:
+                _status_queue.reset(token)
+
+    async def _refine(self, user_query: str) -> str:
+        """Runs the generate-evaluate loop until an answer passes or MAX_LOOPS is reached."""
         current_answer = ""
+        # Critiques are collected in a list and joined once per loop, rather than
+        # growing one string; every prompt this loop reuses the joined text
+        critique_sections: list[str] = []
         feedback_history = ""
+        draft = None
+        draft_feedback = ""
+        streamed = False
+        warning_message = (
+            "**Warning:** The following answer is the model's best attempt but could not be fully validated "
+            f"after {self.valves.MAX_LOOPS} refinement cycles.\n\n---\n\n"
+        )
+
+        candidates = self.valves.CANDIDATES_PER_LOOP
+        # Only number candidates in citations when there is more than one
+        candidate_numbers = range(1, candidates + 1) if candidates > 1 else [None]
 
         for i in range(self.valves.MAX_LOOPS):
             loop_count = i + 1
 
-            # 1. Generate an answer
-            current_answer = await self._generate_answer(
-                user_query, feedback_history, loop_count
-            )
-
-            # 2. Evaluate the answer
-            evaluation = await self._evaluate_answer(user_query, current_answer, loop_count)
+            if self.valves.COMBINED_MODE:
+                # 1-2. Generate and evaluate each candidate answer in a single call
+                results = await asyncio.gather(
+                    *(
+                        self._generate_and_evaluate(
+                            user_query, feedback_history, loop_count, number
+                        )
+                        for number in candidate_numbers
+                    )
+                )
+                current_answer, evaluation = pick_candidate(results)
+            elif candidates > 1:
+                # 1-2. Generate the candidate answers concurrently, then evaluate
+                # them concurrently and keep the first one that passes
+                answers = await asyncio.gather(
+                    *(
+                        self._generate_answer(
+                            user_query, feedback_history, loop_count, candidate=number
+                        )
+                        for number in candidate_numbers
+                    )
+                )
+                evaluations = await asyncio.gather(
+                    *(
+                        self._evaluate_answer(
+                            user_query, answer, loop_count, number, feedback_history
+                        )
+                        for answer, number in zip(answers, candidate_numbers)
+                    )
+                )
+                current_answer, evaluation = pick_candidate(list(zip(answers, evaluations)))
+            else:
+                # A failing verdict on the last refinement could not trigger another
+                # attempt, so it is delivered as the best-effort answer unevaluated
+                final_attempt = loop_count == self.valves.MAX_LOOPS and loop_count > 1
+                # ...and, unless it was already drafted, streamed to the user as it
+                # is generated instead of after the whole answer is done
+                streamed = final_attempt and draft is None
+                if streamed:
+                    await self.emit_message(warning_message)
+
+                # 1. Generate an answer (or pick up the speculative draft for this attempt)
+                answer_feedback = draft_feedback if draft is not None else feedback_history
+                current_answer = await self._generate_answer(
+                    user_query, answer_feedback, loop_count, draft, stream=streamed
+                )
+                draft = None
+
+                # Draft the next attempt with the feedback known so far while the
+                # evaluator grades this one; it is thrown away if the answer passes
+                if self.valves.SPECULATIVE_GENERATION and loop_count < self.valves.MAX_LOOPS:
+                    draft_feedback = feedback_history
+                    draft = self._draft_answer(user_query, draft_feedback)
+
+                if final_attempt:
+                    break
+
+                # 2. Evaluate the answer
+                try:
+                    evaluation = await self._evaluate_answer(
+                        user_query, current_answer, loop_count, feedback=answer_feedback
+                    )
+                except BaseException:
+                    await cancel_task(draft)
+                    raise
 
             # 3. Decide whether to pass or refine
             # --- START OF CORRECTION ---
-            # Use regex to find the word 'PASS' case-insensitively. This is more robust
-            # than checking if the string starts with 'PASS'.
-            is_pass = re.search(r"\bPASS\b", evaluation, re.IGNORECASE)
-
-            if is_pass:
+            # Look for the word 'PASS' case-insensitively anywhere in the evaluation.
+            # This is more robust than only checking if the string starts with 'PASS'.
+            if is_passing(evaluation):
+                await cancel_task(draft)
                 await self.emit_status(
                     "Evaluation passed. Finalizing answer.", done=True
                 )
@@ -296,9 +739,24 @@ class Pipe:
             # If 'PASS' is not found, the entire evaluation is treated as the critique.
             # This is more effective as it includes the model's own reasoning.
             critique = evaluation
-            feedback_history += (
+
+            # A critique of only minor issues is not worth another full refinement
+            if (
+                self.valves.ACCEPT_MINOR_CRITIQUES
+                and loop_count >= 2
+                and is_minor_critique(critique)
+            ):
+                await cancel_task(draft)
+                await self.emit_status(
+                    "Only minor issues found. Finalizing answer.", done=True
+                )
+                await self.emit_message(current_answer)
+                return ""
+
+            critique_sections.append(
                 f"\n\n--- Critique on Attempt #{loop_count} ---\n{critique}"
             )
+            feedback_history = "".join(critique_sections)
 
             # --- END OF CORRECTION ---
 
@@ -312,10 +770,33 @@ class Pipe:
             "Max refinement attempts reached. Providing the best-effort answer.",
             done=True,
         )
-        warning_message = (
-            "**Warning:** The following answer is the model's best attempt but could not be fully validated "
-            f"after {self.valves.MAX_LOOPS} refinement cycles.\n\n---\n\n"
-        )
-        await self.emit_message(warning_message + current_answer)
+        if not streamed:
+            await self.emit_message(warning_message + current_answer)
 
         return ""
+
+
+class MinorCritiqueTest(unittest.TestCase):
+
+    def test_minor_only_critiques_are_accepted(self):
+        for critique in (
+            "FAIL\nOnly minor issues: the second paragraph repeats the first.",
+            "FAIL: Minor wording issues in the conclusion.",
+            "The remaining issues are minor, mostly phrasing.",
+        ):
+            self.assertTrue(is_minor_critique(critique), critique)
+
+    def test_mixed_severity_critique_is_rejected(self):
+        critique = "FAIL\nThe main claim is factually wrong; there is also a minor typo."
+        self.assertFalse(is_minor_critique(critique))
+
+    def test_negated_minor_critique_is_rejected(self):
+        for critique in (
+            "FAIL\nThese are not minor issues.",
+            "FAIL\nThe issues aren't minor: the answer skips the second question.",
+        ):
+            self.assertFalse(is_minor_critique(critique), critique)
+
+
+if __name__ == "__main__":
+    unittest.main()
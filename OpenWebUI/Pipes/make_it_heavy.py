@@ -7,11 +7,14 @@ requirements: []
 """
 
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, List, Any, Callable, Awaitable
+from typing import Optional, Dict, List, Any, Callable, Awaitable, Literal
+from collections import Counter
 import asyncio
+import hashlib
 import time
 import html
 import re
+import string
 
 # Import OpenWebUI utilities at the top level
 from open_webui.utils.chat import generate_chat_completion
@@ -19,6 +22,14 @@ from open_webui.models.users import Users
 from open_webui.constants import TASKS  # <-- 1. IMPORTED TASKS
 from fastapi import Request
 
+# Used by _normalize_text when comparing agent responses for voting. ASCII text
+# (the common case) goes through a single str.translate pass; other text falls
+# back to the regex, which also catches Unicode punctuation.
+PUNCTUATION_TABLE = str.maketrans("", "", string.punctuation.replace("_", ""))
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+# Runs of blank lines collapsed when compressing the synthesis prompt
+BLANK_LINES_PATTERN = re.compile(r"\n{3,}")
+
 
 class Pipe:
     class Valves(BaseModel):
@@ -36,6 +47,12 @@ class Pipe:
             ],
             description="Models to use for each agent (will cycle if fewer than agent_count)",
         )
+        max_concurrent_agents: int = Field(
+            default=4,
+            ge=1,
+            le=6,
+            description="Maximum number of agents calling models at the same time. For Ollama, match the server's OLLAMA_NUM_PARALLEL setting; extra requests would only queue inside the server",
+        )
         synthesis_model: str = Field(
             default="llama3:latest", description="Model to use for final synthesis"
         )
@@ -43,6 +60,14 @@ class Pipe:
             default="synthesize",
             description="Aggregation method: 'synthesize', 'vote', or 'concat'",
         )
+        vote_fallback: Literal["longest", "first", "synthesize"] = Field(
+            default="longest",
+            description="What 'vote' returns when no two agents agree: the 'longest' or 'first' response, or a 'synthesize'd one (costs an extra model call)",
+        )
+        compress_synthesis_prompt: bool = Field(
+            default=True,
+            description="Send agent responses to the synthesis model with extra blank lines, trailing spaces and opening lines shared by all agents removed, to save prompt tokens",
+        )
         max_tokens: int = Field(
             default=512, ge=50, le=2048, description="Maximum tokens per agent response"
         )
@@ -58,6 +83,14 @@ class Pipe:
             ],
             description="Different style prompts for agent diversity",
         )
+        dedup_agents: bool = Field(
+            default=False,
+            description="Share one model call between agents that end up with the same model and style (when agent_count exceeds the number of models/styles). Saves calls, but those agents then return identical answers, which also counts as agreement for 'vote'",
+        )
+        batch_same_model: bool = Field(
+            default=False,
+            description="Ask for one completion per agent in a single request (the 'n' parameter) when agents end up with the same model and style, so the backend processes the shared prompt once. Each agent still gets its own answer. Only useful with backends that support 'n' (OpenAI, vLLM); for others (e.g. Ollama) the remaining agents make their own calls after the first returns",
+        )
         enable_debug: bool = Field(
             default=False, description="Include debug information in output"
         )
@@ -65,6 +98,8 @@ class Pipe:
     def __init__(self):
         self.valves = self.Valves()
         self.__event_emitter__: Optional[Callable[[dict], Awaitable[None]]] = None
+        # Settings shared by every model call, rebuilt from the valves in `pipe`
+        self._body_template: Dict[str, Any] = {}
 
     def pipes(self) -> list[dict]:
         """Required method to register the pipe as a model."""
@@ -102,15 +137,29 @@ class Pipe:
 
     def _normalize_text(self, text: str) -> str:
         """Normalize text for comparison in voting."""
-        text = html.unescape(text.strip().lower())
-        text = re.sub(r"\s+", " ", text)
-        text = re.sub(r"[^\w\s]", "", text)
-        return text
+        text = html.unescape(text.lower())
+        if text.isascii():
+            text = text.translate(PUNCTUATION_TABLE)
+        else:
+            text = PUNCTUATION_PATTERN.sub("", text)
+        return " ".join(text.split())
 
     async def _call_model(
         self, messages: List[Dict], model: str, __request__: Request, __user__: Dict
     ) -> str:
         """Call a model using OpenWebUI's internal chat completion."""
+        return (await self._sample_model(messages, model, __request__, __user__))[0]
+
+    async def _sample_model(
+        self,
+        messages: List[Dict],
+        model: str,
+        __request__: Request,
+        __user__: Dict,
+        n: int = 1,
+    ) -> List[str]:
+        """Call a model asking for `n` completions of the same messages in one
+        request. Backends that ignore `n` return fewer (usually one)."""
         try:
             # Get proper user object if __user__ is a dict
             if isinstance(__user__, dict) and "id" in __user__:
@@ -118,14 +167,10 @@ class Pipe:
             else:
                 user_obj = __user__
 
-            # Create a body for the model call
-            body = {
-                "model": model,
-                "messages": messages,
-                "max_tokens": self.valves.max_tokens,
-                "temperature": 0.7,
-                "stream": False,
-            }
+            # Create a body for the model call from the shared settings
+            body = {**self._body_template, "model": model, "messages": messages}
+            if n > 1:
+                body["n"] = n
 
             # Use OpenWebUI's internal function with proper user object
             response = await generate_chat_completion(__request__, body, user_obj)
@@ -133,26 +178,48 @@ class Pipe:
             # Extract content from response
             if isinstance(response, dict):
                 if "choices" in response and len(response["choices"]) > 0:
-                    return response["choices"][0]["message"]["content"]
+                    return [choice["message"]["content"] for choice in response["choices"]]
                 elif "content" in response:
-                    return response["content"]
+                    return [response["content"]]
 
-            return str(response)
+            return [str(response)]
 
         except Exception as e:
-            return f"Error calling model {model}: {str(e)}"
+            return [f"Error calling model {model}: {str(e)}"]
 
-    async def _run_agent(
-        self, agent_idx: int, query: str, __request__: Request, __user__: Dict
-    ) -> Dict[str, Any]:
-        """Run a single agent with its assigned style."""
-        # Get model for this agent (cycle through available models)
-        model = self.valves.agent_models[agent_idx % len(self.valves.agent_models)]
+    def _agent_model_and_style(self, agent_idx: int) -> tuple[str, str]:
+        """Return the model and style for an agent, cycling through the valves."""
+        return (
+            self.valves.agent_models[agent_idx % len(self.valves.agent_models)],
+            self.valves.agent_styles[agent_idx % len(self.valves.agent_styles)],
+        )
 
-        # Get style for this agent (cycle through available styles)
-        style = self.valves.agent_styles[agent_idx % len(self.valves.agent_styles)]
+    def _sample_slots(self) -> Dict[int, tuple[int, int]]:
+        """Map each agent to (its choice index, number of agents) within the group
+        of agents sharing its model and style, for batch_same_model."""
+        groups: Dict[tuple[str, str], List[int]] = {}
+        for i in range(self.valves.agent_count):
+            groups.setdefault(self._agent_model_and_style(i), []).append(i)
+        return {
+            i: (slot, len(members))
+            for members in groups.values()
+            for slot, i in enumerate(members)
+        }
 
-        await self.emit_status(f"Agent {agent_idx + 1} ({model}) starting...", False)
+    async def _run_agent(
+        self,
+        agent_idx: int,
+        query: str,
+        __request__: Request,
+        __user__: Dict,
+        shared_calls: Optional[Dict[bytes, "asyncio.Future[List[str]]"]] = None,
+        sample_slot: tuple[int, int] = (0, 1),
+    ) -> Dict[str, Any]:
+        """Run a single agent with its assigned style. Agents given the same
+        `shared_calls` dict share one call for an identical prompt: the call asks
+        for `sample_slot[1]` completions and this agent takes choice `sample_slot[0]`."""
+        # Get model and style for this agent (cycle through available ones)
+        model, style = self._agent_model_and_style(agent_idx)
 
         # Prepare messages
         system_prompt = (
@@ -164,13 +231,32 @@ class Pipe:
         ]
 
         try:
-            start_time = time.time()
-            content = await self._call_model(messages, model, __request__, __user__)
-            duration = time.time() - start_time
-
-            await self.emit_status(
-                f"Agent {agent_idx + 1} ({model}) finished in {duration:.2f}s.", True
-            )
+            loop = asyncio.get_running_loop()
+            start = loop.time()
+            if shared_calls is None:
+                content = await self._call_model(messages, model, __request__, __user__)
+            else:
+                key = hashlib.blake2b(
+                    "\0".join(
+                        (model, str(self.valves.max_tokens), system_prompt, query)
+                    ).encode("utf-8"),
+                    digest_size=16,
+                ).digest()
+                slot, n = sample_slot
+                call = shared_calls.get(key)
+                if call is None:
+                    call = shared_calls[key] = asyncio.ensure_future(
+                        self._sample_model(messages, model, __request__, __user__, n)
+                    )
+                choices = await call
+                if slot < len(choices):
+                    content = choices[slot]
+                else:
+                    # The backend ignored `n`, so this agent needs its own call
+                    content = await self._call_model(
+                        messages, model, __request__, __user__
+                    )
+            duration = loop.time() - start
 
             return {
                 "agent_id": agent_idx + 1,
@@ -181,7 +267,6 @@ class Pipe:
                 "success": True,
             }
         except Exception as e:
-            await self.emit_status(f"Agent {agent_idx + 1} ({model}) failed.", True)
             return {
                 "agent_id": agent_idx + 1,
                 "model": model,
@@ -191,6 +276,71 @@ class Pipe:
                 "success": False,
             }
 
+    def _unanimous_response(self, agent_results: List[Dict]) -> Optional[str]:
+        """Return the response if all successful agents (at least two) gave the same
+        answer, ignoring case, whitespace and punctuation; otherwise None."""
+        contents = [r["content"] for r in agent_results if r["success"]]
+        if len(contents) < 2:
+            return None
+
+        first = contents[0]
+        # Byte-identical answers are the cheap case; only normalize if that fails
+        if all(content == first for content in contents[1:]):
+            return first
+        normalized = self._normalize_text(first)
+        if all(self._normalize_text(content) == normalized for content in contents[1:]):
+            return first
+        return None
+
+    def _compress_agent_block(self, successful_results: List[Dict]) -> str:
+        """Format agent responses compactly for the synthesis prompt: trailing spaces
+        and extra blank lines are dropped, and opening lines shared by every
+        response are listed once instead of per agent. No content is removed."""
+        responses = [
+            BLANK_LINES_PATTERN.sub(
+                "\n\n", "\n".join(line.rstrip() for line in r["content"].splitlines())
+            ).strip()
+            for r in successful_results
+        ]
+
+        parts = []
+        if len(responses) > 1:
+            split_responses = [response.split("\n") for response in responses]
+            shared = 0
+            for lines in zip(*split_responses):
+                if any(line != lines[0] for line in lines[1:]):
+                    break
+                shared += 1
+            # Never strip a whole response away
+            shared = min(shared, min(len(lines) for lines in split_responses) - 1)
+            if shared > 0 and any(split_responses[0][:shared]):
+                shared_text = "\n".join(split_responses[0][:shared]).strip()
+                parts.append(f"All agents began with:\n{shared_text}\n\n")
+                responses = ["\n".join(lines[shared:]).strip() for lines in split_responses]
+
+        for result, response in zip(successful_results, responses):
+            parts.append(f"Agent {result['agent_id']}:\n{response}\n\n")
+        return "".join(parts)
+
+    def _vote_winner(self, successful_results: List[Dict]) -> Optional[str]:
+        """Return the most common response (normalized) if at least two agents gave it."""
+        # Buckets are keyed by a short digest of the normalized text and keep
+        # only the first original response
+        vote_counts = Counter()
+        first_responses = {}
+        for result in successful_results:
+            normalized = self._normalize_text(result["content"])
+            key = hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).digest()
+            vote_counts[key] += 1
+            first_responses.setdefault(key, result["content"])
+
+        if vote_counts:
+            # Get the most frequent response
+            key, votes = vote_counts.most_common(1)[0]
+            if votes > 1:
+                return first_responses[key]  # Return original text of most common
+        return None
+
     def _aggregate_responses(self, agent_results: List[Dict], query: str) -> str:
         """Aggregate agent responses based on the chosen strategy."""
         strategy = self.valves.aggregation_strategy.lower()
@@ -209,40 +359,38 @@ class Pipe:
             return "\n\n".join(parts)
 
         elif strategy == "vote":
-            # Find most common response (normalized)
-            content_map = {}
-            for result in successful_results:
-                normalized = self._normalize_text(result["content"])
-                if normalized not in content_map:
-                    content_map[normalized] = []
-                content_map[normalized].append(result["content"])
-
-            if content_map:
-                # Get the most frequent response
-                most_common = max(content_map.items(), key=lambda x: len(x[1]))
-                if len(most_common[1]) > 1:
-                    return most_common[1][0]  # Return original text of most common
-
-            # If no clear winner, fall back to synthesis
+            winner = self._vote_winner(successful_results)
+            if winner is not None:
+                return winner
+
+            # If no clear winner, fall back without another model call unless
+            # synthesis was asked for
+            if self.valves.vote_fallback == "longest":
+                return max(successful_results, key=lambda r: len(r["content"]))["content"]
+            if self.valves.vote_fallback == "first":
+                return successful_results[0]["content"]
             strategy = "synthesize"
 
         if strategy == "synthesize":
-            # Create synthesis prompt
-            synthesis_prompt = (
+            # Create synthesis prompt, collecting the pieces and joining once
+            parts = [
                 "You are tasked with synthesizing multiple AI responses into one coherent, "
                 "accurate, and well-structured answer. Consider all perspectives and create "
                 "a unified response that incorporates the best insights from each.\n\n"
                 "Original question:\n"
                 f"{query}\n\n"
                 "AI Agent Responses:\n\n"
-            )
+            ]
 
-            for result in successful_results:
-                synthesis_prompt += (
-                    f"Agent {result['agent_id']} response:\n{result['content']}\n\n"
-                )
+            if self.valves.compress_synthesis_prompt:
+                parts.append(self._compress_agent_block(successful_results))
+            else:
+                for result in successful_results:
+                    parts.append(
+                        f"Agent {result['agent_id']} response:\n{result['content']}\n\n"
+                    )
 
-            synthesis_prompt += (
+            parts.append(
                 "Please provide a synthesized response that:\n"
                 "1. Combines the best insights from all responses\n"
                 "2. Resolves any contradictions\n"
@@ -251,7 +399,7 @@ class Pipe:
                 "Synthesized response:"
             )
 
-            return synthesis_prompt
+            return "".join(parts)
 
         # Default fallback
         return successful_results[0]["content"]
@@ -267,6 +415,11 @@ class Pipe:
         """Main pipe function that orchestrates multi-agent processing."""
 
         self.__event_emitter__ = __event_emitter__
+        self._body_template = {
+            "max_tokens": self.valves.max_tokens,
+            "temperature": 0.7,
+            "stream": False,
+        }
 
         # 3. --- ADDED GUARD CLAUSE ---
         # Handle non-chat tasks (like title generation) by just calling the synthesis model directly
@@ -302,7 +455,7 @@ class Pipe:
             await self.emit_status("Error: Missing required request context.", True)
             return "Error: Missing required request context for model execution."
 
-        start_time = time.time()
+        start_ns = time.monotonic_ns()
 
         try:
             # Extract user query
@@ -312,11 +465,9 @@ class Pipe:
                 return "No messages provided."
 
             # Get the last user message
-            user_message = None
-            for msg in reversed(messages):
-                if msg.get("role") == "user":
-                    user_message = msg
-                    break
+            user_message = next(
+                (msg for msg in reversed(messages) if msg.get("role") == "user"), None
+            )
 
             if not user_message or not user_message.get("content", "").strip():
                 await self.emit_status("Error: No user query found.", True)
@@ -325,34 +476,60 @@ class Pipe:
             query = user_message["content"].strip()
 
             # Run agents in parallel
-            await self.emit_status(f"Spawning {self.valves.agent_count} agents...", False)
-            agent_tasks = []
-            for i in range(self.valves.agent_count):
-                task = self._run_agent(i, query, __request__, __user__)
-                agent_tasks.append(task)
-
-            # Wait for all agents to complete
-            agent_results = await asyncio.gather(*agent_tasks, return_exceptions=True)
-
-            # Handle any exceptions from gather
-            processed_results = []
-            for i, result in enumerate(agent_results):
+            # Progress is reported once at the start and once per finished agent,
+            # rather than with separate start/finish updates from every agent
+            await self.emit_status(
+                f"Running {self.valves.agent_count} agents in parallel...", False
+            )
+            # Limit how many agents hit the backend at once
+            semaphore = asyncio.Semaphore(self.valves.max_concurrent_agents)
+            batch = self.valves.batch_same_model
+            shared_calls = {} if batch or self.valves.dedup_agents else None
+            sample_slots = self._sample_slots() if batch else {}
+
+            async def run_indexed_agent(i: int):
+                try:
+                    async with semaphore:
+                        return i, await self._run_agent(
+                            i,
+                            query,
+                            __request__,
+                            __user__,
+                            shared_calls,
+                            sample_slots.get(i, (0, 1)),
+                        )
+                except Exception as e:
+                    return i, e
+
+            agent_tasks = [
+                run_indexed_agent(i) for i in range(self.valves.agent_count)
+            ]
+
+            # Handle agents as they finish, so each citation shows up without
+            # waiting for the slowest agent; results are kept in agent order
+            processed_results = [None] * self.valves.agent_count
+            finished = failed = 0
+            for next_finished in asyncio.as_completed(agent_tasks):
+                i, result = await next_finished
                 if isinstance(result, Exception):
-                    processed_results.append(
-                        {
-                            "agent_id": i + 1,
-                            "model": "unknown",
-                            "style": "unknown",
-                            "content": f"Agent failed with exception: {str(result)}",
-                            "duration": 0,
-                            "success": False,
-                        }
-                    )
-                else:
-                    processed_results.append(result)
+                    result = {
+                        "agent_id": i + 1,
+                        "model": "unknown",
+                        "style": "unknown",
+                        "content": f"Agent failed with exception: {str(result)}",
+                        "duration": 0,
+                        "success": False,
+                    }
+                processed_results[i] = result
+                finished += 1
+                failed += not result["success"]
+                await self.emit_status(
+                    f"{finished}/{self.valves.agent_count} agents complete"
+                    + (f" ({failed} failed)." if failed else "."),
+                    False,
+                )
 
-            # Emit citations for successful agent responses
-            for result in processed_results:
+                # Emit citation for a successful agent response
                 if result["success"]:
                     await self.emit_citation(
                         title=f"Agent {result['agent_id']} ({result['model']})",
@@ -362,7 +539,29 @@ class Pipe:
 
             # Aggregate responses
             aggregation_strategy = self.valves.aggregation_strategy.lower()
-            if aggregation_strategy == "synthesize":
+            successful_results = [r for r in processed_results if r["success"]]
+            # Vote only needs the synthesis model when there is no winner and
+            # vote_fallback asks for it
+            needs_synthesis = aggregation_strategy == "synthesize" or (
+                aggregation_strategy == "vote"
+                and self.valves.vote_fallback == "synthesize"
+                and self._vote_winner(successful_results) is None
+            )
+            unanimous_response = (
+                self._unanimous_response(processed_results)
+                if aggregation_strategy == "synthesize"
+                else None
+            )
+            if aggregation_strategy == "synthesize" and len(successful_results) == 1:
+                # A single answer (agent_count=1, or all others failed) has nothing
+                # to be synthesized with, so return it as-is
+                await self.emit_status("Only one agent response. Skipping synthesis.", False)
+                final_response = successful_results[0]["content"]
+            elif unanimous_response is not None:
+                # Every agent gave the same answer, so there is nothing to synthesize
+                await self.emit_status("All agents agree. Skipping synthesis.", False)
+                final_response = unanimous_response
+            elif needs_synthesis:
                 await self.emit_status(
                     f"Synthesizing responses with {self.valves.synthesis_model}...",
                     False,
@@ -403,7 +602,7 @@ class Pipe:
 
             # Add debug information if enabled
             if self.valves.enable_debug:
-                total_time = time.time() - start_time
+                total_time = (time.monotonic_ns() - start_ns) / 1e9
                 debug_info = f"\n\n---\n**Debug Info:**\n"
                 debug_info += f"- Total processing time: {total_time:.2f}s\n"
                 debug_info += f"- Agents used: {self.valves.agent_count}\n"
@@ -3,14 +3,19 @@ title: Hugging Face Image Generator
 description: Generates images from text prompts using HuggingFace's Inference API
 author: TheBlackCat98
 version: 0.2.0
-requirements: huggingface_hub, Pillow
+requirements: huggingface_hub, aiohttp, Pillow
 """
 
 
+import asyncio
 import base64
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from pydantic import BaseModel, Field
 import logging
-from huggingface_hub import InferenceClient
+from huggingface_hub import AsyncInferenceClient
 from io import BytesIO
 from PIL import Image
 
@@ -20,6 +25,85 @@ from open_webui.config import CACHE_DIR
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Generated images (as markdown with a data URL), keyed by the request arguments.
+# A fixed seed gives the same image, so repeating a request can skip the
+# generation. Each entry holds a whole base64 PNG, hence the small size.
+CACHE_SIZE = 32
+CACHE_TTL = 3600  # seconds
+_image_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
+
+def cache_key(*args) -> bytes:
+    """Hashes the arguments of a generation into a compact cache key."""
+    return hashlib.blake2b(
+        "\0".join(map(str, args)).encode("utf-8"), digest_size=16
+    ).digest()
+
+
+def cache_get(key: bytes) -> Optional[str]:
+    """Returns a cached result that has not expired, marking it recently used."""
+    entry = _image_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, result = entry
+    if time.monotonic() - stored_at > CACHE_TTL:
+        del _image_cache[key]
+        return None
+    _image_cache.move_to_end(key)
+    return result
+
+
+def cache_put(key: bytes, result: str):
+    """Caches a result, evicting the least recently used ones beyond CACHE_SIZE."""
+    _image_cache[key] = (time.monotonic(), result)
+    _image_cache.move_to_end(key)
+    while len(_image_cache) > CACHE_SIZE:
+        _image_cache.popitem(last=False)
+
+
+# Inference clients by API key, shared by every Tools instance so each key's
+# client (and its provider lookups and connections) is set up only once
+_clients: Dict[str, AsyncInferenceClient] = {}
+
+
+def get_client(api_key: str) -> AsyncInferenceClient:
+    """Returns the module-wide inference client for an API key, creating it on first use."""
+    client = _clients.get(api_key)
+    if client is None:
+        client = _clients[api_key] = AsyncInferenceClient(
+            provider="auto",
+            api_key=api_key
+        )
+    return client
+
+
+# Magic bytes of the image formats a data URL can carry as-is
+IMAGE_SIGNATURES = {
+    b"\x89PNG": "image/png",
+    b"\xff\xd8": "image/jpeg",
+}
+
+
+def image_data_url(image: Image.Image) -> str:
+    """
+    Returns a base64 data URL for an image from text_to_image.
+
+    The client opens the provider's response lazily, so the original bytes are
+    usually still attached to the image; PNG and JPEG bytes are used as-is instead
+    of decoding and re-encoding the whole image as PNG.
+    """
+    fp = getattr(image, "fp", None)
+    raw = fp.getvalue() if isinstance(fp, BytesIO) else b""
+    mime_type = next(
+        (mime for signature, mime in IMAGE_SIGNATURES.items() if raw.startswith(signature)),
+        None,
+    )
+    if mime_type is None:
+        buffered = BytesIO()
+        image.save(buffered, format="PNG")
+        raw, mime_type = buffered.getvalue(), "image/png"
+    return f"data:{mime_type};base64,{base64.b64encode(raw).decode()}"
+
 
 class HFException(Exception):
     """Base exception for HuggingFace API related errors."""
@@ -28,6 +112,16 @@ class HFException(Exception):
 
 
 class Tools:
+    # Image dimensions for each supported format
+    FORMATS: Dict[str, Tuple[int, int]] = {
+        "default": (1024, 1024),
+        "square": (1024, 1024),
+        "landscape": (1024, 768),
+        "landscape_large": (1440, 1024),
+        "portrait": (768, 1024),
+        "portrait_large": (1024, 1440),
+    }
+
     class Valves(BaseModel):
         HF_API_KEY: str = Field(
             default=None,
@@ -46,10 +140,7 @@ class Tools:
         if not self.client:
             if not self.valves.HF_API_KEY:
                 raise ValueError("HuggingFace API key is not set in the Valves.")
-            self.client = InferenceClient(
-                provider="auto",
-                api_key=self.valves.HF_API_KEY
-            )
+            self.client = get_client(self.valves.HF_API_KEY)
         return self.client
 
     async def _emit_status(
@@ -99,50 +190,49 @@ class Tools:
             return error_msg
 
         # Set image dimensions
-        formats = {
-            "default": (1024, 1024),
-            "square": (1024, 1024),
-            "landscape": (1024, 768),
-            "landscape_large": (1440, 1024),
-            "portrait": (768, 1024),
-            "portrait_large": (1024, 1440),
-        }
-
-        if image_format not in formats:
-            error_msg = f"Invalid format. Must be one of: {', '.join(formats.keys())}"
+        dimensions = self.FORMATS.get(image_format)
+        if dimensions is None:
+            error_msg = f"Invalid format. Must be one of: {', '.join(self.FORMATS.keys())}"
             await self._emit_status(event_emitter, "complete", error_msg, True)
             return error_msg
 
-        width, height = formats[image_format]
+        width, height = dimensions
         model = model or self.valves.MODEL_NAME
 
+        key = cache_key(prompt, image_format, model, seed)
+        cached = cache_get(key)
+        if cached is not None:
+            await self._emit_status(
+                event_emitter, "complete", "Image served from cache.", True
+            )
+            return cached
+
         try:
             await self._emit_status(
                 event_emitter, "in_progress", "Generating image...", False
             )
 
             # Generate the image
-            image = client.text_to_image(
+            image = await client.text_to_image(
                 prompt=prompt,
                 model=model,
                 width=width,
-                height=height
+                height=height,
+                seed=seed,
             )
-            
-            # Convert image to base64
-            buffered = BytesIO()
-            image.save(buffered, format="PNG")
-            img_str = base64.b64encode(buffered.getvalue()).decode()
-            
-            # Create a data URL for the image
-            image_url = f"data:image/png;base64,{img_str}"
+
+            # Create a base64 data URL for the image, in a worker thread since
+            # encoding is CPU work that would otherwise stall the event loop
+            image_url = await asyncio.to_thread(image_data_url, image)
+
+            # Return simple markdown with the image
+            result = f"![{prompt}]({image_url})"
+            cache_put(key, result)
 
             await self._emit_status(
                 event_emitter, "complete", "Image generated successfully!", True
             )
-            
-            # Return simple markdown with the image
-            return f"![{prompt}]({image_url})"
+            return result
 
         except Exception as e:
             error_msg = f"Error generating image: {str(e)}"
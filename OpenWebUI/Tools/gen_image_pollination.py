@@ -8,8 +8,77 @@ license: #
 description: AI Image generations using Pollinations.ai.
 """
 
+import asyncio
+import hashlib
+import importlib.util
+import time
 import httpx
-from typing import Awaitable, Callable, Dict, Tuple
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import quote
+
+# HTTP/2 lets concurrent generations share one connection, but needs the optional
+# h2 package; without it the client falls back to pooled HTTP/1.1 connections
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Generations in flight at once across all Tools instances. Pollinations serves
+# one image per request, so there is nothing to batch, but bursts beyond this
+# would only run into its rate limit (HTTP 429)
+MAX_CONCURRENT_REQUESTS = 4
+_request_slots = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+# Generated image links, keyed by the request arguments. A fixed seed gives the
+# same image, so repeating a request can skip the generation entirely
+CACHE_SIZE = 256
+CACHE_TTL = 3600  # seconds
+_image_cache: "OrderedDict[bytes, Tuple[float, str]]" = OrderedDict()
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Returns the module-wide HTTP client, shared by every Tools instance so its
+    keep-alive connections are reused. It is recreated if it was closed."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_keepalive_connections=50,
+                max_connections=100,
+                keepalive_expiry=300.0,
+            ),
+            timeout=120.0,
+        )
+    return _client
+
+
+def cache_key(*args) -> bytes:
+    """Hashes the arguments of a generation into a compact cache key."""
+    return hashlib.blake2b(
+        "\0".join(map(str, args)).encode("utf-8"), digest_size=16
+    ).digest()
+
+
+def cache_get(key: bytes) -> Optional[str]:
+    """Returns a cached result that has not expired, marking it recently used."""
+    entry = _image_cache.get(key)
+    if entry is None:
+        return None
+    stored_at, result = entry
+    if time.monotonic() - stored_at > CACHE_TTL:
+        del _image_cache[key]
+        return None
+    _image_cache.move_to_end(key)
+    return result
+
+
+def cache_put(key: bytes, result: str):
+    """Caches a result, evicting the least recently used ones beyond CACHE_SIZE."""
+    _image_cache[key] = (time.monotonic(), result)
+    _image_cache.move_to_end(key)
+    while len(_image_cache) > CACHE_SIZE:
+        _image_cache.popitem(last=False)
 
 
 class Tools:
@@ -30,9 +99,8 @@ class Tools:
 
     def __init__(self):
         """
-        Initializes the Tools class and a persistent httpx.AsyncClient for performance.
+        Initializes the Tools class. Requests go through the shared client from get_client().
         """
-        self.client = httpx.AsyncClient()
 
     async def _emit_status(
         self, event_emitter, status: str, description: str, done: bool
@@ -75,12 +143,21 @@ class Tools:
             event_emitter, "in_progress", "Image generation started...", False
         )
 
-        if image_format not in self.FORMATS:
+        dimensions = self.FORMATS.get(image_format)
+        if dimensions is None:
             error_msg = f"Invalid aspect ratio: '{image_format}'. Please use one of: {list(self.FORMATS.keys())}"
             await self._emit_status(event_emitter, "complete", error_msg, True)
             return error_msg
 
-        width, height = self.FORMATS[image_format]
+        width, height = dimensions
+
+        key = cache_key(prompt, image_format, model, enhance, seed)
+        cached = cache_get(key)
+        if cached is not None:
+            await self._emit_status(
+                event_emitter, "complete", "Image served from cache.", True
+            )
+            return cached
 
         params = {
             "width": width,
@@ -91,18 +168,22 @@ class Tools:
             "seed": seed,
         }
 
-        url_path_safe_prompt = httpx.URL(prompt).path
-        url = f"{self.BASE_URL}{url_path_safe_prompt}"
+        # Percent-encode the whole prompt as a single path segment
+        url = f"{self.BASE_URL}{quote(prompt, safe='')}"
 
         try:
-            response = await self.client.get(url, params=params, timeout=120.0)
+            async with _request_slots:
+                response = await get_client().get(url, params=params)
             response.raise_for_status()
             image_url = str(response.url)
 
+            result = f"![{prompt}]({image_url})"
+            cache_put(key, result)
+
             await self._emit_status(
                 event_emitter, "complete", "Image generation successful!", True
             )
-            return f"![{prompt}]({image_url})"
+            return result
 
         except httpx.HTTPStatusError as e:
             error_msg = (
@@ -121,7 +202,8 @@ class Tools:
 
     async def aclose(self):
         """
-        Closes the underlying httpx.AsyncClient session.
-        This should be called when the tool is no longer needed to release resources.
+        Closes the shared httpx.AsyncClient to release its connections.
+        The next request creates a new client, so other instances keep working.
         """
-        await self.client.aclose()
+        if _client is not None:
+            await _client.aclose()
@@ -4,19 +4,224 @@ author: theblackcat98
 author_url: https://github.com/theblackcat98
 git_url: https://github.com/Theblackcat98/Awesome-AI-Python-Scripts
 description: A tool that returns the full transcript of a YouTube video with enhanced error handling and configuration.
-requirements: langchain-yt-dlp
+requirements: youtube-transcript-api>=1.0, yt-dlp
 version: 0.2.0
 license: MIT
 """
 
 import unittest
+import asyncio
+import json
+import os
 import re
-from typing import Any, Callable, Coroutine
+import sqlite3
+import time
+from collections import OrderedDict
+from contextlib import closing
+from typing import Any, Callable, Coroutine, Dict, List, Tuple
 
-# Note: The original code had a mix of langchain_yt_dlp and langchain_community.
-# YoutubeLoader is in langchain_community, so we will stick with that.
-from langchain_community.document_loaders import YoutubeLoader
+import yt_dlp
 from pydantic import BaseModel, Field
+from youtube_transcript_api import (
+    CouldNotRetrieveTranscript,
+    NoTranscriptFound,
+    TranscriptsDisabled,
+    YouTubeTranscriptApi,
+)
+
+try:
+    from open_webui.config import CACHE_DIR
+except ImportError:  # Running outside Open WebUI, e.g. the tests below
+    CACHE_DIR = os.path.expanduser("~/.cache")
+
+# Matches YouTube video URLs (including youtu.be and mobile links) and captures the video ID
+YOUTUBE_URL_PATTERN = re.compile(
+    r"(?:https?://)?(?:www\.|m\.)?(?:youtube\.com|youtu\.be)/(?:watch\?v=)?([A-Za-z0-9_-]{11})"
+)
+# Canonical form of a video's URL, used for fetching and for the source citation
+YOUTUBE_WATCH_URL = "https://www.youtube.com/watch?v={}"
+
+# Every start YOUTUBE_URL_PATTERN accepts, so junk input is rejected without the regex
+YOUTUBE_URL_PREFIXES = tuple(
+    scheme + subdomain + host
+    for scheme in ("https://", "http://", "")
+    for subdomain in ("www.", "m.", "")
+    for host in ("youtube.com/", "youtu.be/")
+)
+
+# Transcripts fetched at once by get_youtube_transcripts
+MAX_CONCURRENT_LOADS = 8
+
+# Loaded transcripts, keyed by video ID and loader options, so asking about the
+# same video again does not refetch its page and captions from YouTube
+CACHE_SIZE = 512
+CACHE_TTL = 1800  # seconds
+_transcript_cache: "OrderedDict[tuple, Tuple[float, dict]]" = OrderedDict()
+# Loads in flight, shared by concurrent requests for the same key
+_pending_loads: Dict[tuple, "asyncio.Future[dict]"] = {}
+
+# Transcripts are also kept on disk (for CACHE_TTL_SECONDS), so they survive
+# restarts; only the most recent DISK_CACHE_SIZE entries are kept
+DISK_CACHE_PATH = os.path.join(str(CACHE_DIR), "youtube_transcripts.sqlite3")
+DISK_CACHE_SIZE = 2048
+
+
+def _open_disk_cache() -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(DISK_CACHE_PATH), exist_ok=True)
+    conn = sqlite3.connect(DISK_CACHE_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS videos (key TEXT PRIMARY KEY, stored_at REAL, video TEXT)"
+    )
+    return conn
+
+
+def _disk_cache_get(key: str, ttl: float) -> dict | None:
+    """Returns the cached video for a key, or None if missing or expired."""
+    with closing(_open_disk_cache()) as conn:
+        row = conn.execute(
+            "SELECT stored_at, video FROM videos WHERE key = ?", (key,)
+        ).fetchone()
+    if row is None or time.time() - row[0] > ttl:
+        return None
+    return json.loads(row[1])
+
+
+def _disk_cache_put(key: str, video: dict, ttl: float):
+    """Stores a video for a key, dropping expired and least recent entries."""
+    payload = json.dumps(video, default=str)
+    now = time.time()
+    with closing(_open_disk_cache()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO videos VALUES (?, ?, ?)", (key, now, payload)
+        )
+        conn.execute("DELETE FROM videos WHERE stored_at < ?", (now - ttl,))
+        conn.execute(
+            "DELETE FROM videos WHERE key NOT IN "
+            "(SELECT key FROM videos ORDER BY stored_at DESC LIMIT ?)",
+            (DISK_CACHE_SIZE,),
+        )
+
+
+VIDEO_UNAVAILABLE_MESSAGE = "Failed to retrieve video data. The video may be private, deleted, age-restricted, or the URL is incorrect."
+
+
+def _fetch_transcript(video_id: str, languages: List[str], translation: str) -> str:
+    """
+    Fetches a video's transcript text, in the first available of the given
+    languages, or else any transcript translated to `translation`.
+    Returns "" if the video has no usable transcript.
+    """
+    try:
+        transcript_list = YouTubeTranscriptApi().list(video_id)
+        try:
+            transcript = transcript_list.find_transcript(languages)
+        except NoTranscriptFound:
+            transcript = next(iter(transcript_list), None)
+            if transcript is None:
+                return ""
+            if translation and transcript.language_code != translation:
+                if not transcript.is_translatable:
+                    return ""
+                transcript = transcript.translate(translation)
+        snippets = transcript.fetch()
+    except (NoTranscriptFound, TranscriptsDisabled):
+        return ""
+    except CouldNotRetrieveTranscript as e:
+        # Unavailable, private or blocked videos
+        raise ConnectionError(VIDEO_UNAVAILABLE_MESSAGE) from e
+    return " ".join(snippet.text.strip(" ") for snippet in snippets)
+
+
+def _fetch_video_info(video_id: str) -> dict:
+    """Fetches a video's title and author with yt-dlp (without downloading it)."""
+    options = {"quiet": True, "no_warnings": True, "skip_download": True}
+    try:
+        with yt_dlp.YoutubeDL(options) as ydl:
+            info = ydl.extract_info(YOUTUBE_WATCH_URL.format(video_id), download=False)
+    except yt_dlp.utils.DownloadError as e:
+        raise ConnectionError(VIDEO_UNAVAILABLE_MESSAGE) from e
+    return {
+        "title": info.get("title"),
+        "author": info.get("uploader") or info.get("channel"),
+    }
+
+
+async def fetch_video(
+    video_id: str,
+    languages: List[str],
+    translation: str,
+    add_video_info: bool,
+) -> dict:
+    """Fetches a video's transcript and (optionally) metadata from YouTube, both at once."""
+    transcript_task = asyncio.to_thread(_fetch_transcript, video_id, languages, translation)
+    if not add_video_info:
+        return {"transcript": await transcript_task, "metadata": {}}
+    transcript, metadata = await asyncio.gather(
+        transcript_task, asyncio.to_thread(_fetch_video_info, video_id)
+    )
+    return {"transcript": transcript, "metadata": metadata}
+
+
+async def _load_video(key: tuple, disk_ttl: float) -> dict:
+    """Loads a video from the disk cache, or from YouTube (then caching it)."""
+    video_id, languages, translation, add_video_info = key
+    disk_key = json.dumps(key)
+    try:
+        video = await asyncio.to_thread(_disk_cache_get, disk_key, disk_ttl)
+    except (sqlite3.Error, OSError):
+        video = None  # An unusable cache only costs the refetch
+    if video is not None:
+        return video
+
+    video = await fetch_video(video_id, list(languages), translation, add_video_info)
+    if video["transcript"]:
+        try:
+            await asyncio.to_thread(_disk_cache_put, disk_key, video, disk_ttl)
+        except (sqlite3.Error, OSError):
+            pass
+    return video
+
+
+def _finish_load(key: tuple, task: "asyncio.Future[dict]"):
+    """Caches a finished load (unless it failed or found no transcript)."""
+    _pending_loads.pop(key, None)
+    if task.cancelled() or task.exception() is not None or not task.result()["transcript"]:
+        return
+    _transcript_cache[key] = (time.monotonic(), task.result())
+    _transcript_cache.move_to_end(key)
+    while len(_transcript_cache) > CACHE_SIZE:
+        _transcript_cache.popitem(last=False)
+
+
+async def load_video(
+    video_id: str,
+    languages: List[str],
+    translation: str,
+    add_video_info: bool,
+    use_cache: bool = True,
+    disk_ttl: float = 0,
+) -> dict:
+    """Loads a video's transcript and metadata (as a dict with those keys), from
+    the memory or disk cache when possible (see the CACHE_ENABLED and
+    CACHE_TTL_SECONDS valves). Concurrent requests for the same video and
+    options share one load."""
+    if not use_cache:
+        return await fetch_video(video_id, languages, translation, add_video_info)
+
+    key = (video_id, tuple(languages), translation, add_video_info)
+    entry = _transcript_cache.get(key)
+    if entry is not None:
+        if time.monotonic() - entry[0] <= CACHE_TTL:
+            _transcript_cache.move_to_end(key)
+            return entry[1]
+        del _transcript_cache[key]
+
+    task = _pending_loads.get(key)
+    if task is None:
+        task = _pending_loads[key] = asyncio.ensure_future(_load_video(key, disk_ttl))
+        task.add_done_callback(lambda done: _finish_load(key, done))
+    # Shielded so one caller giving up does not cancel the load for the others
+    return await asyncio.shield(task)
 
 
 class EventEmitter:
@@ -72,6 +277,17 @@ class Tools:
             title="Append Source Citation",
             description="If True, appends the source YouTube URL to the end of the result.",
         )
+        CACHE_ENABLED: bool = Field(
+            default=True,
+            title="Cache Transcripts",
+            description="If True, transcripts are cached in memory and on disk, so asking about the same video again skips fetching it from YouTube.",
+        )
+        CACHE_TTL_SECONDS: int = Field(
+            default=7 * 24 * 3600,
+            ge=0,
+            title="Disk Cache Lifetime",
+            description="How long transcripts stay in the on-disk cache, in seconds (default 7 days).",
+        )
         FAIL_ON_NO_TRANSCRIPT: bool = Field(
             default=True,
             title="Fail if No Transcript Found",
@@ -109,42 +325,48 @@ class Tools:
 
         try:
             await emitter.progress(f"Validating URL: {url}")
-            youtube_regex = r"(?:https?:\/\/)?(?:www\.)?(?:youtube\.com|youtu\.be)\/(?:watch\?v=)?([\w-]{11})"
-            if not url or not isinstance(url, str) or not re.match(youtube_regex, url):
+            match = (
+                YOUTUBE_URL_PATTERN.match(url)
+                if isinstance(url, str) and url.startswith(YOUTUBE_URL_PREFIXES)
+                else None
+            )
+            if not match:
                 raise ValueError("Invalid or malformed YouTube URL provided. Please provide a valid URL (e.g., https://www.youtube.com/watch?v=...).")
 
+            # The ID is all that is needed from here on, and the citation uses the
+            # canonical URL whatever form the user gave
+            video_id = match.group(1)
+            url = YOUTUBE_WATCH_URL.format(video_id)
+
             await emitter.progress("Fetching video transcript and metadata...")
             languages = [lang.strip() for lang in valves.TRANSCRIPT_LANGUAGE.split(",")]
 
-            loader = YoutubeLoader.from_youtube_url(
-                youtube_url=url,
-                add_video_info=valves.ADD_VIDEO_INFO,
-                language=languages,
-                translation=valves.TRANSCRIPT_TRANSLATE_TO,
+            video = await load_video(
+                video_id,
+                languages,
+                valves.TRANSCRIPT_TRANSLATE_TO,
+                valves.ADD_VIDEO_INFO,
+                valves.CACHE_ENABLED,
+                valves.CACHE_TTL_SECONDS,
             )
-            
-            docs = await loader.aload()
 
-            if not docs:
-                raise ConnectionError("Failed to retrieve video data. The video may be private, deleted, age-restricted, or the URL is incorrect.")
+            has_transcript = bool(video["transcript"])
 
-            transcript_content = "\n".join([doc.page_content for doc in docs if doc.page_content])
-            
-            if not transcript_content and valves.FAIL_ON_NO_TRANSCRIPT:
+            if not has_transcript and valves.FAIL_ON_NO_TRANSCRIPT:
                 raise ValueError(f"No transcript found for the specified languages ('{valves.TRANSCRIPT_LANGUAGE}'). Check if the video has captions on YouTube.")
 
             # Prepare output
             result_parts = []
             title = ""
             if valves.ADD_VIDEO_INFO:
-                metadata = docs[0].metadata
-                title = metadata.get("title", "Unknown Title")
-                author = metadata.get("author", "Unknown Author")
+                metadata = video["metadata"]
+                title = metadata.get("title") or "Unknown Title"
+                author = metadata.get("author") or "Unknown Author"
                 result_parts.append(f"{title}\nby {author}\n")
                 await emitter.progress(f"Found video: '{title}' by {author}")
 
-            if transcript_content:
-                result_parts.append(transcript_content)
+            if has_transcript:
+                result_parts.append(video["transcript"])
             elif valves.ADD_VIDEO_INFO:
                 result_parts.append("[No transcript was found or retrieved.]")
             
@@ -160,6 +382,39 @@ class Tools:
             await emitter.error(error_message)
             return error_message
 
+    async def get_youtube_transcripts(
+        self,
+        urls: list[str],
+        __event_emitter__: Callable[[dict], Coroutine[Any, Any, None]] = None,
+        __user__: dict | None = None,
+    ) -> str:
+        """
+        Provides the transcripts of several YouTube videos at once.
+        Only use if the user supplies more than one valid YouTube URL.
+
+        :param urls: The URLs of the YouTube videos.
+        :return: Each video's transcript and details (or error message), separated by horizontal rules.
+        """
+        emitter = EventEmitter(__event_emitter__)
+        await emitter.progress(f"Fetching {len(urls)} video transcripts...")
+
+        # The videos are fetched concurrently, a few at a time; per-video status
+        # updates are left out since they would interleave
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_LOADS)
+
+        async def get_one(url: str) -> str:
+            async with semaphore:
+                return await self.get_youtube_transcript(url, __user__=__user__)
+
+        results = await asyncio.gather(*(get_one(url) for url in urls))
+
+        failed = sum(result.startswith("Error:") for result in results)
+        if failed:
+            await emitter.error(f"Retrieved {len(urls) - failed} of {len(urls)} transcripts.")
+        else:
+            await emitter.success(f"Retrieved {len(urls)} transcripts.")
+        return "\n\n---\n\n".join(results)
+
 
 class YoutubeTranscriptProviderTest(unittest.IsolatedAsyncioTestCase):
     
@@ -181,6 +436,16 @@ class YoutubeTranscriptProviderTest(unittest.IsolatedAsyncioTestCase):
         response_missing = await tool.get_youtube_transcript("https://www.youtube.com/watch?v=nonexistent11")
         self.assertIn("Error: ConnectionError", response_missing)
 
+    def test_url_pattern_extracts_video_id(self):
+        for url in (
+            "https://www.youtube.com/watch?v=H-JV9jGkG_g",
+            "https://m.youtube.com/watch?v=H-JV9jGkG_g",
+            "https://youtu.be/H-JV9jGkG_g",
+        ):
+            self.assertEqual(YOUTUBE_URL_PATTERN.match(url).group(1), "H-JV9jGkG_g")
+        self.assertIsNone(YOUTUBE_URL_PATTERN.match("https://evil.com/youtube.com/watch?v=H-JV9jGkG_g"))
+        self.assertFalse("https://evil.com/youtube.com/watch?v=H-JV9jGkG_g".startswith(YOUTUBE_URL_PREFIXES))
+
     async def test_no_transcript_fail_valve(self):
         url = "https://www.youtube.com/watch?v=34Na4j8AVgA" # Music video, no transcript
         tool = Tools()
@@ -8,7 +8,13 @@ version: 1.1.0
 license: MIT
 """
 
-import aiohttp
+import asyncio
+import hashlib
+import importlib.util
+import json
+import time
+from collections import OrderedDict
+import httpx
 from typing import Any, Optional, Callable, Awaitable, Literal
 from pydantic import BaseModel, Field
 import logging
@@ -18,6 +24,91 @@ from fastapi.responses import HTMLResponse
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+try:
+    import orjson
+
+    load_json = orjson.loads
+
+except ImportError:
+    load_json = json.loads
+
+# HTTP client shared by all searches, so they reuse the keep-alive connection
+# (and DNS lookup) to the YouTube Data API instead of a new TLS handshake each.
+# HTTP/2 multiplexes concurrent searches over that one connection, but needs the
+# optional h2 package; without it the client pools HTTP/1.1 connections
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+_client: Optional[httpx.AsyncClient] = None
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Return the shared HTTP client, creating it on first use or after it was closed."""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            http2=HTTP2_AVAILABLE,
+            limits=httpx.Limits(
+                max_keepalive_connections=16,
+                max_connections=32,
+                keepalive_expiry=75.0,
+            ),
+            timeout=httpx.Timeout(10.0, connect=3.0),
+        )
+    return _client
+
+
+# YouTube Data API v3 search endpoint
+SEARCH_URL = "https://www.googleapis.com/youtube/v3/search"
+
+# Recent search results, keyed by query, search settings and (a hash of) the API
+# key. Identical searches within SEARCH_CACHE_TTL are answered without spending
+# API quota
+SEARCH_CACHE_SIZE = 512
+SEARCH_CACHE_TTL = 300  # seconds
+_search_cache: "OrderedDict[tuple, tuple[float, list]]" = OrderedDict()
+# Searches in flight, shared by concurrent identical requests
+_pending_searches: dict[tuple, "asyncio.Future[tuple[int, list]]"] = {}
+
+
+async def _fetch_search(search_params: dict[str, str | int]) -> tuple[int, list]:
+    """Run a search request, returning the HTTP status and the result items."""
+    response = await _get_client().get(SEARCH_URL, params=search_params)
+    if response.status_code != 200:
+        return response.status_code, []
+    search_data = load_json(response.content)
+    return response.status_code, search_data.get("items") or []
+
+
+def _finish_search(key: tuple, task: "asyncio.Future[tuple[int, list]]") -> None:
+    """Cache a finished search (unless it failed)."""
+    _pending_searches.pop(key, None)
+    if task.cancelled() or task.exception() is not None:
+        return
+    status, items = task.result()
+    if status != 200:
+        return
+    _search_cache[key] = (time.monotonic(), items)
+    _search_cache.move_to_end(key)
+    while len(_search_cache) > SEARCH_CACHE_SIZE:
+        _search_cache.popitem(last=False)
+
+
+async def search_items(key: tuple, search_params: dict[str, str | int]) -> tuple[int, list]:
+    """Return (status, items) for a search, from the cache when possible.
+    Concurrent identical searches share one request."""
+    entry = _search_cache.get(key)
+    if entry is not None:
+        if time.monotonic() - entry[0] <= SEARCH_CACHE_TTL:
+            _search_cache.move_to_end(key)
+            return 200, entry[1]
+        del _search_cache[key]
+
+    task = _pending_searches.get(key)
+    if task is None:
+        task = _pending_searches[key] = asyncio.ensure_future(_fetch_search(search_params))
+        task.add_done_callback(lambda done: _finish_search(key, done))
+    # Shielded so one caller giving up does not cancel the search for the others
+    return await asyncio.shield(task)
+
 
 async def emit_status(
     event_emitter: Optional[Callable[[Any], Awaitable[None]]],
@@ -31,23 +122,25 @@ async def emit_status(
         )
 
 
-async def emit_embed(
-    video_id: str,
-) -> HTMLResponse:
-    """Helper to emit embed events for displaying video player"""
-
-    iframe_html = f"""
+# Embedded player markup, filled in with a video ID
+IFRAME_TEMPLATE = """
 <div style="width:100%;max-width:1200px;margin:0 auto;">
   <div style="position:relative;width:100%;padding-top:56.25%;height:0;overflow:hidden;border-radius:8px;box-shadow:0 2px 12px rgba(0,0,0,0.2);">
-    <iframe src="https://www.youtube.com/embed/{video_id}"
+    <iframe src="https://www.youtube.com/embed/{}"
             style="position:absolute;top:0;left:0;width:100%;height:100%;border:0;"
             allow="accelerometer; autoplay; clipboard-write; encrypted-media; gyroscope; picture-in-picture; fullscreen"
             allowfullscreen loading="lazy"></iframe>
   </div>
 </div>
 """.strip()
+INLINE_HEADERS = {"content-disposition": "inline"}
 
-    return HTMLResponse(content=iframe_html, headers={"content-disposition": "inline"})
+
+async def emit_embed(
+    video_id: str,
+) -> HTMLResponse:
+    """Helper to emit embed events for displaying video player"""
+    return HTMLResponse(content=IFRAME_TEMPLATE.format(video_id), headers=INLINE_HEADERS)
 
 
 class Tools:
@@ -101,9 +194,6 @@ class Tools:
         await emit_status(__event_emitter__, f"Searching YouTube for: {query}")
 
         try:
-            # YouTube Data API v3 search endpoint
-            search_url = "https://www.googleapis.com/youtube/v3/search"
-
             search_params:dict[str, str | int] = {
                 "part": "snippet",
                 "q": query,
@@ -115,46 +205,47 @@ class Tools:
                 "order": "relevance",
             }
 
-            async with aiohttp.ClientSession() as session:
-                async with session.get(search_url, params=search_params) as response:
-                    if response.status == 403:
-                        return "Error: Invalid API key or API quota exceeded. Please check your YouTube Data API key and quota at https://console.cloud.google.com/apis/api/youtube.googleapis.com"
-                    elif response.status != 200:
-                        return f"Error: YouTube API returned status {response.status}"
-
-                    search_data = await response.json()
-
-                    if "items" not in search_data or not search_data["items"]:
-                        return f"No videos found for query: '{query}'"
-
-                    # Build results
-                    result = f"**YouTube Search Results for '{query}'**\n\n"
-
-                    for i, item in enumerate(search_data["items"], 1):
-                        video_id = item["id"]["videoId"]
-                        snippet = item["snippet"]
-                        title = snippet.get("title", "Unknown Title")
-                        channel = snippet.get("channelTitle", "Unknown Channel")
-                        description = snippet.get("description", "")[:150]
-
-                        result += f"**{i}. {title}**\n"
-                        result += f"   • Channel: {channel}\n"
-                        result += (
-                            f"   • URL: https://www.youtube.com/watch?v={video_id}\n"
-                        )
-                        if description:
-                            result += f"   • Description: {description}...\n"
-                        result += "\n"
-
-                        # Embed first video if enabled
-                        if i == 1 and self.valves.SHOW_EMBEDDED_PLAYER:
-                            await emit_status(__event_emitter__, "Search completed", done=True)
-                            return await emit_embed(video_id)
-
-                    await emit_status(__event_emitter__, "Search completed", done=True)
-                    return result
-
-        except aiohttp.ClientError as e:
+            # The API key is part of the key, so an invalid key still gets its own
+            # error and each key's searches count against its own quota
+            api_key_hash = hashlib.blake2b(
+                self.valves.YOUTUBE_API_KEY.encode("utf-8"), digest_size=16
+            ).digest()
+            key = (query, max_results, self.valves.REGION_CODE, self.valves.SAFE_SEARCH, api_key_hash)
+            status, items = await search_items(key, search_params)
+            if status == 403:
+                return "Error: Invalid API key or API quota exceeded. Please check your YouTube Data API key and quota at https://console.cloud.google.com/apis/api/youtube.googleapis.com"
+            elif status != 200:
+                return f"Error: YouTube API returned status {status}"
+
+            if not items:
+                return f"No videos found for query: '{query}'"
+
+            # Embed the first video if enabled (the text listing is not returned then)
+            if self.valves.SHOW_EMBEDDED_PLAYER:
+                await emit_status(__event_emitter__, "Search completed", done=True)
+                return await emit_embed(items[0]["id"]["videoId"])
+
+            # Build results, joined once at the end
+            parts = [f"**YouTube Search Results for '{query}'**\n\n"]
+
+            for i, item in enumerate(items, 1):
+                video_id = item["id"]["videoId"]
+                snippet = item["snippet"]
+                title = snippet.get("title", "Unknown Title")
+                channel = snippet.get("channelTitle", "Unknown Channel")
+                description = snippet.get("description", "")[:150]
+
+                parts.append(f"**{i}. {title}**\n")
+                parts.append(f"   • Channel: {channel}\n")
+                parts.append(f"   • URL: https://www.youtube.com/watch?v={video_id}\n")
+                if description:
+                    parts.append(f"   • Description: {description}...\n")
+                parts.append("\n")
+
+            await emit_status(__event_emitter__, "Search completed", done=True)
+            return "".join(parts)
+
+        except httpx.RequestError as e:
             logger.error(f"Network error during YouTube search: {str(e)}")
             return f"Error: Network error occurred - {str(e)}"
         except Exception as e: